@@ -168,8 +168,81 @@ document.addEventListener("DOMContentLoaded", function () {
   const loadMoreButton = document.getElementById('loadMoreButton');
   const paginationInfo = document.getElementById('paginationInfo');
   const tagFilterContainer = document.querySelector('.tag-filter-tabs');
-  
-  if (blogListContainer) {
+
+  // Lists pre-rendered by scripts/list_pages.py: the tabs and the newest posts
+  // are already in the page; older pages and tag lists are static HTML
+  // fragments, fetched only when asked for
+  if (blogListContainer && blogListContainer.dataset.list) {
+    const listBase = 'https://raymee675.github.io/Raymee-s-Secret-Base/data/BlogData/lists';
+    const pageSize = parseInt(blogListContainer.dataset.pageSize, 10) || 20;
+    const initialHtml = blogListContainer.innerHTML;
+    const initialNextPage = parseInt(blogListContainer.dataset.nextPage, 10) || 0;
+    const tabs = Array.from(document.querySelectorAll('.tag-tab'));
+    let currentTab = tabs.find((btn) => btn.dataset.tag === 'all') || null;
+    let nextPage = initialNextPage;
+    let generation = 0;
+    let loadingMore = false;
+
+    function fetchFragment(tab, page) {
+      const list = tab.dataset.tag === 'all' ? 'all' : `tag-${tab.dataset.tag}`;
+      // data-version changes whenever the list does, so the fragment can be cached
+      const url = `${listBase}/${list}-${page}.html?v=${tab.dataset.version || ''}`;
+      return fetch(url).then((res) => {
+        if (!res.ok) throw new Error(`fetch failed: ${url} (${res.status})`);
+        return res.text();
+      });
+    }
+
+    function updatePagination() {
+      const shown = blogListContainer.querySelectorAll('.blog-item').length;
+      const total = currentTab ? parseInt(currentTab.dataset.total, 10) || shown : shown;
+      if (paginationInfo) paginationInfo.textContent = `表示中: ${shown} / ${total}`;
+      if (loadMoreButton) loadMoreButton.style.display = nextPage > 0 ? 'block' : 'none';
+    }
+
+    function loadMore() {
+      if (loadingMore || nextPage <= 0 || !currentTab) return Promise.resolve();
+      loadingMore = true;
+      const requested = generation;
+      return fetchFragment(currentTab, nextPage)
+        .then((html) => {
+          // a newer tag selection superseded this request
+          if (requested !== generation) return;
+          blogListContainer.insertAdjacentHTML('beforeend', html);
+          nextPage -= 1;
+          updatePagination();
+        })
+        .catch((err) => console.error(err))
+        .then(() => {
+          if (requested === generation) loadingMore = false;
+        });
+    }
+
+    function showList(tab) {
+      generation += 1;
+      loadingMore = false;
+      currentTab = tab;
+      tabs.forEach((btn) => btn.classList.toggle('active', btn === tab));
+      if (tab.dataset.tag === 'all') {
+        blogListContainer.innerHTML = initialHtml;
+        nextPage = initialNextPage;
+        updatePagination();
+        return;
+      }
+      blogListContainer.innerHTML = '';
+      nextPage = parseInt(tab.dataset.pages, 10) || 0;
+      loadMore().then(() => {
+        // the newest page of a list can be short; top it up with the one before
+        if (blogListContainer.querySelectorAll('.blog-item').length < pageSize) loadMore();
+      });
+    }
+
+    tabs.forEach((btn) => btn.addEventListener('click', () => showList(btn)));
+    if (loadMoreButton) loadMoreButton.addEventListener('click', loadMore);
+    updatePagination();
+  }
+
+  if (blogListContainer && !blogListContainer.dataset.list) {
     let allPosts = [];
     let filteredPosts = [];
     let currentPage = 0;
@@ -181,7 +254,11 @@ document.addEventListener("DOMContentLoaded", function () {
     // prefer CDN. If the primary source fails, fall back to the alternative.
     const cdnBase = 'https://raymee675.github.io/Raymee-s-Secret-Base';
     const cdnPostsPath = `${cdnBase}/data/BlogData/posts.json`;
+    const cdnIndexPath = `${cdnBase}/data/BlogData/posts-index.json`;
     const cdnCategoryPath = `${cdnBase}/data/Category.json`;
+    // full post records by id, filled page by page from posts-N.json
+    const postRecords = {};
+    const loadedPages = {};
 
     // If opened via file://, prefer CDN to avoid local path issues in some setups
     let primaryUrl = cdnPostsPath;
@@ -204,12 +281,19 @@ document.addEventListener("DOMContentLoaded", function () {
           });
         }
         
-        // Now load posts
-        return fetchJson(primaryUrl);
+        // Now load the post index (ids, dates, tags); fall back to the full posts.json
+        return fetchJson(cdnIndexPath).catch(() =>
+          fetchJson(primaryUrl).then((meta) => {
+            const posts = ((meta && meta.posts) || []).filter((post) => post.published === true);
+            posts.forEach((post) => {
+              postRecords[post.id] = post;
+            });
+            return { posts: posts };
+          })
+        );
       })
-      .then((meta) => {
-        // Filter only published posts
-        allPosts = ((meta && meta.posts) || []).filter((post) => post.published === true);
+      .then((index) => {
+        allPosts = (index && index.posts) || [];
         if (allPosts.length === 0) {
           blogListContainer.innerHTML = '<div class="muted">投稿が見つかりません。</div>';
           return;
@@ -291,11 +375,47 @@ document.addEventListener("DOMContentLoaded", function () {
       renderPage(0);
     }
 
+    // fetch the posts-N.json pages holding the given index entries
+    function loadRecords(entries) {
+      const pages = [];
+      entries.forEach((entry) => {
+        if (postRecords[entry.id] || !entry.page || loadedPages[entry.page]) return;
+        if (!pages.includes(entry.page)) pages.push(entry.page);
+      });
+      pages.forEach((page) => {
+        loadedPages[page] = fetchJson(`${cdnBase}/data/BlogData/posts-${page}.json`)
+          .then((data) => {
+            ((data && data.posts) || []).forEach((post) => {
+              postRecords[post.id] = post;
+            });
+          })
+          .catch((err) => {
+            // allow a later render to retry this page
+            delete loadedPages[page];
+            throw err;
+          });
+      });
+      return Promise.all(Object.values(loadedPages)).then(() =>
+        entries.map((entry) => postRecords[entry.id] || entry)
+      );
+    }
+
     function renderPage(pageNum) {
       const startIdx = pageNum * postsPerPage;
       const endIdx = startIdx + postsPerPage;
-      const postsToShow = filteredPosts.slice(startIdx, endIdx);
-      
+      const entries = filteredPosts.slice(startIdx, endIdx);
+      const requestedTag = selectedTag;
+
+      return loadRecords(entries).then((postsToShow) => {
+        // a newer tag selection superseded this render
+        if (requestedTag !== selectedTag) return;
+        renderRecords(pageNum, postsToShow, endIdx);
+      }).catch((err) => {
+        console.error(err);
+      });
+    }
+
+    function renderRecords(pageNum, postsToShow, endIdx) {
         const html = postsToShow
         .map((p) => {
           const rawTitle = p.title || `Post ${p.id}`;
@@ -363,8 +483,14 @@ document.addEventListener("DOMContentLoaded", function () {
 
     // Load more button click handler
     if (loadMoreButton) {
+      let loadingMore = false;
       loadMoreButton.addEventListener('click', function () {
-        renderPage(currentPage + 1);
+        // ignore repeated clicks while the next page's records are loading
+        if (loadingMore) return;
+        loadingMore = true;
+        renderPage(currentPage + 1).then(() => {
+          loadingMore = false;
+        });
       });
     }
   }
@@ -517,11 +643,24 @@ document.addEventListener("DOMContentLoaded", function () {
       relatedPostsContainer.innerHTML = html;
     }
     
+    // Related posts are precomputed at build time into related/<id>.json;
+    // fall back to scoring the full posts.json when that is unavailable
+    function loadRelatedPosts() {
+      const idMatch = decodeURIComponent(currentPath).match(/\/data\/BlogData\/(\d+)\//);
+      const computeFromAllPosts = () =>
+        fetchJson(cdnPostsPath).then((meta) => {
+          const allPosts = (meta && meta.posts) || [];
+          return findRelatedPosts(allPosts, currentTags, currentPath);
+        });
+      if (!idMatch) return computeFromAllPosts();
+      return fetchJson(`${cdnBase}/data/BlogData/related/${idMatch[1]}.json`)
+        .then((data) => (data && data.related) || [])
+        .catch(computeFromAllPosts);
+    }
+
     // Load and display related posts
-    fetchJson(cdnPostsPath)
-      .then((meta) => {
-        const allPosts = (meta && meta.posts) || [];
-        const relatedPosts = findRelatedPosts(allPosts, currentTags, currentPath);
+    loadRelatedPosts()
+      .then((relatedPosts) => {
         renderRelatedPosts(relatedPosts);
       })
       .catch((err) => {
@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Per-image WebP settings for process_raw_posts.py --adaptive-webp.
+
+choose_webp_options() decides on a probe, the image scaled down to
+PROBE_SIZE, instead of encoding the full image over and over:
+
+- images with few colors (UI captures, diagrams, pixel art) are also tried
+  lossless, which wins when it is no larger than lossy at MAX_QUALITY
+- otherwise the quality is bisected between MIN_QUALITY and MAX_QUALITY for
+  the lowest one whose luma PSNR against the probe is at least PSNR_FLOOR,
+  then lowered further if the probe is still over MAX_BITS_PER_PIXEL
+
+Photographic images are encoded with PHOTO_METHOD: method 6 roughly doubles
+the encode time for a percent or two of bytes on photos.
+
+SettingsRecord keeps each decision by source content hash, so a source seen
+before is encoded with its recorded settings without searching again.
+"""
+import io
+import json
+import math
+import threading
+from pathlib import Path
+
+from PIL import Image, ImageChops
+
+from post_store import dump_json, write_if_changed
+
+PROBE_SIZE = 512
+MIN_QUALITY = 50
+MAX_QUALITY = 90
+PSNR_FLOOR = 38.0
+MAX_BITS_PER_PIXEL = 2.0
+FLAT_MAX_COLORS = 4096
+PHOTO_METHOD = 4
+FLAT_METHOD = 6
+# handed to the encoder in place of options when none are recorded yet
+SEARCH = "search"
+
+
+def params_signature() -> str:
+    return (
+        f"psnr{PSNR_FLOOR}:bpp{MAX_BITS_PER_PIXEL}:q{MIN_QUALITY}-{MAX_QUALITY}:"
+        f"probe{PROBE_SIZE}:colors{FLAT_MAX_COLORS}:m{PHOTO_METHOD}/{FLAT_METHOD}"
+    )
+
+
+def _encode(im, **options) -> bytes:
+    buf = io.BytesIO()
+    im.save(buf, format="WEBP", **options)
+    return buf.getvalue()
+
+
+def luma_psnr(a, b) -> float:
+    diff = ImageChops.difference(a.convert("L"), b.convert("L"))
+    squared = sum(count * value * value for value, count in enumerate(diff.histogram()))
+    mse = squared / (a.width * a.height)
+    return math.inf if mse == 0 else 10 * math.log10(255 * 255 / mse)
+
+
+def choose_webp_options(im) -> dict:
+    """WebP save() options for im (RGB or RGBA)."""
+    probe = im.copy()
+    probe.thumbnail((PROBE_SIZE, PROBE_SIZE), Image.BILINEAR)
+    budget = probe.width * probe.height * MAX_BITS_PER_PIXEL / 8
+    flat = probe.getcolors(FLAT_MAX_COLORS) is not None
+    method = FLAT_METHOD if flat else PHOTO_METHOD
+
+    if flat:
+        lossless = _encode(probe, lossless=True, quality=100, method=FLAT_METHOD)
+        if len(lossless) <= len(_encode(probe, quality=MAX_QUALITY, method=method)):
+            return {"lossless": True, "quality": 100, "method": FLAT_METHOD}
+
+    def _meets_floor(quality):
+        with Image.open(io.BytesIO(_encode(probe, quality=quality, method=method))) as decoded:
+            return luma_psnr(probe, decoded) >= PSNR_FLOOR
+
+    lo, hi = MIN_QUALITY, MAX_QUALITY
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if _meets_floor(mid):
+            hi = mid
+        else:
+            lo = mid + 1
+    quality = lo
+
+    # the floor can ask for more bytes than the budget allows; the budget wins
+    if len(_encode(probe, quality=quality, method=method)) > budget:
+        lo, hi = MIN_QUALITY, quality
+        while lo < hi:
+            mid = (lo + hi + 1) // 2
+            if len(_encode(probe, quality=mid, method=method)) <= budget:
+                lo = mid
+            else:
+                hi = mid - 1
+        quality = lo
+    return {"lossless": False, "quality": quality, "method": method}
+
+
+class SettingsRecord:
+    """{source sha256: options} saved as JSON; dropped whole when the search parameters change."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self.images = {}
+        try:
+            with self.path.open("r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("params") == params_signature():
+                self.images = data.get("images") or {}
+        except (OSError, ValueError):
+            pass
+
+    def get(self, digest: str):
+        with self._lock:
+            return self.images.get(digest)
+
+    def put(self, digest: str, options: dict):
+        with self._lock:
+            self.images[digest] = options
+
+    def save(self) -> bool:
+        with self._lock:
+            data = {"params": params_signature(), "images": dict(sorted(self.images.items()))}
+        return write_if_changed(self.path, dump_json(data, indent=2))
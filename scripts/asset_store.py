@@ -0,0 +1,230 @@
+#!/usr/bin/env python3
+"""
+Content-addressed store for post media: data/BlogData/assets/<hash><ext>.
+
+With process_raw_posts.py --asset-store, the images, videos and audio a post
+would keep in its own images/, videos/ and audio/ directories are moved into
+the store instead, and the post's HTML points at their hashed URLs. A file
+used by several posts (the same icon, the same social card) is stored once,
+and since a name never changes content, assets can be cached as immutable.
+
+Assets nothing links to any more are removed with
+
+    python scripts/asset_store.py gc [--dry-run]
+
+which keeps every asset referenced from a post page (data/BlogData/*/*.html),
+the home page, or a --watch preview.
+"""
+import os
+import re
+import sys
+import shutil
+import hashlib
+import tempfile
+import argparse
+from pathlib import Path
+from urllib.parse import quote, unquote
+
+from site_config import SITE_URL, atomic_write_bytes, file_sha256
+
+ROOT = Path(__file__).resolve().parent.parent
+BLOG_DIR = ROOT / "data" / "BlogData"
+ASSET_DIR = BLOG_DIR / "assets"
+PREVIEW_DIR = ROOT / ".cache" / "preview"
+# 80 bits of sha256 is plenty for one site's media
+HASH_CHARS = 20
+MEDIA_DIRS = ("images", "videos", "audio")
+
+ASSET_NAME_RE = re.compile(r"assets/([0-9a-f]{" + str(HASH_CHARS) + r"}\.[0-9a-z]+)")
+TAG_RE = re.compile(r"<[a-zA-Z][^>]*>")
+# attributes that can hold a post-relative media URL; srcset holds a list of them
+REF_ATTR_RE = re.compile(r"""(\s(src|href|content|poster|srcset)\s*=\s*)(?:"([^"]*)"|'([^']*)')""", flags=re.I)
+
+
+class AssetStore:
+    def __init__(self, asset_dir: Path = ASSET_DIR, base_url: str = SITE_URL):
+        self.asset_dir = Path(asset_dir)
+        rel = self.asset_dir.relative_to(ROOT).as_posix() if self.asset_dir.is_relative_to(ROOT) else self.asset_dir.name
+        self.url_prefix = f"{base_url}{rel}/"
+        self.stored = 0
+        self.reused = 0
+
+    def _name(self, digest: str, ext: str) -> str:
+        return f"{digest[:HASH_CHARS]}{ext.lower()}"
+
+    def url(self, name: str) -> str:
+        return self.url_prefix + name
+
+    def file_name(self, path: Path) -> str:
+        return self._name(file_sha256(path), Path(path).suffix)
+
+    def put_file(self, path: Path, name: str = None, keep: bool = False) -> str:
+        """
+        Move path into the store (dropping it if the content is there already),
+        or copy it with keep; returns its URL.
+        """
+        path = Path(path)
+        name = name or self.file_name(path)
+        dest = self.asset_dir / name
+        if dest.exists():
+            if not keep:
+                path.unlink()
+            self.reused += 1
+        else:
+            self.asset_dir.mkdir(parents=True, exist_ok=True)
+            if keep:
+                fd, tmp = tempfile.mkstemp(prefix=f".{name}.", suffix=".tmp", dir=self.asset_dir)
+                os.close(fd)
+                try:
+                    shutil.copyfile(path, tmp)
+                    os.chmod(tmp, 0o644)
+                    os.replace(tmp, dest)
+                except BaseException:
+                    if os.path.exists(tmp):
+                        os.unlink(tmp)
+                    raise
+            else:
+                try:
+                    os.replace(path, dest)
+                except OSError:
+                    shutil.move(str(path), str(dest))
+            self.stored += 1
+        return self.url(name)
+
+    def put_bytes(self, data: bytes, ext: str) -> str:
+        name = self._name(hashlib.sha256(data).hexdigest(), ext)
+        dest = self.asset_dir / name
+        if dest.exists():
+            self.reused += 1
+        else:
+            atomic_write_bytes(dest, data)
+            self.stored += 1
+        return self.url(name)
+
+    def adopt(self, post_dir: Path, html: str) -> str:
+        """
+        Move the media under post_dir's images/, videos/ and audio/ into the
+        store and return html with their references rewritten to asset URLs.
+        References are the src, href, content and poster values and srcset
+        candidates of html's tags, raw or URL-encoded. A file referenced
+        anywhere else as well (inline CSS, a script) is copied instead and
+        stays where that reference points; one html does not reference at
+        all stays too.
+        """
+        post_dir = Path(post_dir)
+        files = {}
+        for sub in MEDIA_DIRS:
+            media_dir = post_dir / sub
+            if media_dir.is_dir():
+                for path in sorted(p for p in media_dir.rglob("*") if p.is_file()):
+                    files[path.relative_to(post_dir).as_posix()] = path
+        if not files:
+            return html
+
+        names = {}
+        used = set()
+
+        def _asset_url(ref):
+            for rel in (ref, unquote(ref)):
+                if rel in files:
+                    if rel not in names:
+                        names[rel] = self.file_name(files[rel])
+                    used.add(rel)
+                    return self.url(names[rel])
+            return ref
+
+        def _rewrite_attr(m):
+            value = m.group(3) if m.group(3) is not None else m.group(4)
+            if m.group(2).lower() == "srcset":
+                candidates = [c.split(None, 1) for c in value.split(",") if c.strip()]
+                urls = [_asset_url(c[0]) for c in candidates]
+                if urls == [c[0] for c in candidates]:
+                    return m.group(0)
+                value = ", ".join(" ".join([url] + c[1:]) for url, c in zip(urls, candidates))
+            else:
+                url = _asset_url(value.strip())
+                if url == value.strip():
+                    return m.group(0)
+                value = url
+            quote_char = '"' if m.group(3) is not None else "'"
+            return f"{m.group(1)}{quote_char}{value}{quote_char}"
+
+        def _rewrite_tag(m):
+            return REF_ATTR_RE.sub(_rewrite_attr, m.group(0))
+
+        html = TAG_RE.sub(_rewrite_tag, html)
+        for rel in sorted(used):
+            path = files[rel]
+            if rel in html or quote(rel, safe="/") in html:
+                print(f"Warning: {post_dir / rel} is also referenced where it cannot be rewritten; keeping a copy there")
+                self.put_file(path, names[rel], keep=True)
+            else:
+                self.put_file(path, names[rel])
+        for sub in MEDIA_DIRS:
+            _remove_empty_dirs(post_dir / sub)
+        return html
+
+    def referenced(self, pages):
+        names = set()
+        for page in pages:
+            try:
+                text = Path(page).read_text(encoding="utf-8")
+            except (OSError, UnicodeDecodeError):
+                continue
+            names.update(ASSET_NAME_RE.findall(text))
+        return names
+
+    def gc(self, pages, dry_run: bool = False):
+        """Remove assets none of pages references. Returns (removed names, bytes freed)."""
+        if not self.asset_dir.is_dir():
+            return [], 0
+        keep = self.referenced(pages)
+        removed = []
+        freed = 0
+        for path in sorted(self.asset_dir.iterdir()):
+            if not path.is_file() or path.name in keep:
+                continue
+            freed += path.stat().st_size
+            removed.append(path.name)
+            if not dry_run:
+                path.unlink()
+        return removed, freed
+
+
+def _remove_empty_dirs(top: Path):
+    if not top.is_dir():
+        return
+    for dirpath, _dirnames, _filenames in sorted(os.walk(top), key=lambda w: -len(w[0])):
+        try:
+            os.rmdir(dirpath)
+        except OSError:
+            pass
+
+
+def site_pages():
+    """Every page that can link to an asset."""
+    pages = [ROOT / "index.html"]
+    pages += sorted(BLOG_DIR.glob("*/*.html"))
+    if PREVIEW_DIR.is_dir():
+        pages += sorted(PREVIEW_DIR.glob("*/*.html"))
+    return pages
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Maintain the content-addressed asset store")
+    sub = parser.add_subparsers(dest="command", required=True)
+    gc_parser = sub.add_parser("gc", help="remove assets no page references")
+    gc_parser.add_argument("--dry-run", action="store_true", help="only list what would be removed")
+    args = parser.parse_args(argv)
+
+    store = AssetStore()
+    if args.command == "gc":
+        removed, freed = store.gc(site_pages(), dry_run=args.dry_run)
+        for name in removed:
+            print(("Would remove " if args.dry_run else "Removed ") + name)
+        print(f"{len(removed)} unreferenced asset(s), {freed} bytes{' (dry run)' if args.dry_run else ''}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
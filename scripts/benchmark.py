@@ -0,0 +1,274 @@
+#!/usr/bin/env python3
+"""
+Benchmark the raw post pipeline on a synthetic corpus.
+
+A temporary ROOT gets a copy of scripts/, HTMLTemplates/, index.html and
+data/Category.json plus N generated raw items under data/BlogData/RawData:
+an HTML page rendered from HTMLTemplates/ and M images of the given
+resolution in data/ directories (every other item nests some of them one
+level deeper, like assets/data/). Images are drawn from a seeded RNG, so a
+corpus is the same on every run.
+
+Measured:
+- pipeline.cold / pipeline.warm  process_raw_posts.py on the corpus, then
+                                 again with nothing new; the stage timers of
+                                 each run's report are included
+- micro.*                        single stages timed in-process (best of
+                                 --repeat) on the output of the cold run
+
+Results can be saved as a baseline and compared against one; any metric
+slower than the baseline by more than --threshold fails the run.
+
+    python scripts/benchmark.py --posts 20 --images 3 --save-baseline bench.json
+    python scripts/benchmark.py --posts 20 --images 3 --baseline bench.json
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import subprocess
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+SCRIPTS_DIR = Path(__file__).resolve().parent
+REPO_ROOT = SCRIPTS_DIR.parent
+# stage timers below this are noise and never count as regressions
+MIN_COMPARED_SECONDS = 0.05
+WORDS = ["ルーミア", "月", "絵", "曲", "Unity", "Web", "開発", "東方", "記事", "写真", "そーなのかー", "界力"]
+
+
+def make_image(path: Path, size, rng: random.Random):
+    w, h = size
+    im = Image.new("RGB", size, tuple(rng.randrange(256) for _ in range(3)))
+    draw = ImageDraw.Draw(im)
+    # enough structure that the encoders do real work
+    for _ in range(60):
+        x0, y0 = rng.randrange(w), rng.randrange(h)
+        x1, y1 = min(w, x0 + rng.randrange(w // 4 + 1)), min(h, y0 + rng.randrange(h // 4 + 1))
+        draw.rectangle((x0, y0, x1, y1), fill=tuple(rng.randrange(256) for _ in range(3)))
+    for _ in range(40):
+        draw.line(
+            (rng.randrange(w), rng.randrange(h), rng.randrange(w), rng.randrange(h)),
+            fill=tuple(rng.randrange(256) for _ in range(3)),
+            width=rng.randrange(1, 8),
+        )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    im.save(path, format="PNG")
+
+
+def _sentence(rng: random.Random, words: int = 12):
+    return "".join(rng.choice(WORDS) for _ in range(words)) + "。"
+
+
+def write_raw_item(item_dir: Path, index: int, images: int, size, rng: random.Random, renderer):
+    from post_templates import parse_post_source
+
+    image_names = [f"img{index}_{n}" for n in range(images)]
+    body = [f"# トピック {index}"]
+    for n, name in enumerate(image_names):
+        body.append(_sentence(rng))
+        body.append(f"![]({name}.png)")
+        if n % 2:
+            body.append("")
+            body.append(f"# トピック {index}-{n}")
+    source = "\n".join([
+        "---",
+        f"title: ベンチマーク記事 {index}",
+        f"description: {_sentence(rng, 6)}",
+        f"tags: {rng.randrange(6)}/{rng.randrange(6)}",
+        "---",
+        *body,
+    ])
+    front, topics = parse_post_source(source)
+    item_dir.mkdir(parents=True, exist_ok=True)
+    (item_dir / f"post{index}.html").write_text("".join(renderer.iter_post(front, topics)), encoding="utf-8")
+    for n, name in enumerate(image_names):
+        data_dir = item_dir / ("assets/data" if index % 2 and n % 2 else "data")
+        make_image(data_dir / f"{name}.png", size, rng)
+
+
+def build_root(root: Path, posts: int, images: int, size, seed: int):
+    from post_templates import PostRenderer, TemplateSet
+
+    shutil.copytree(SCRIPTS_DIR, root / "scripts", ignore=shutil.ignore_patterns("__pycache__"))
+    shutil.copytree(REPO_ROOT / "HTMLTemplates", root / "HTMLTemplates")
+    shutil.copy2(REPO_ROOT / "index.html", root / "index.html")
+    (root / "data").mkdir()
+    shutil.copy2(REPO_ROOT / "data" / "Category.json", root / "data" / "Category.json")
+    raw_dir = root / "data" / "BlogData" / "RawData"
+    raw_dir.mkdir(parents=True)
+    rng = random.Random(seed)
+    renderer = PostRenderer(TemplateSet(REPO_ROOT / "HTMLTemplates"))
+    for i in range(1, posts + 1):
+        write_raw_item(raw_dir / f"raw{i:04d}", i, images, size, rng, renderer)
+
+
+def run_pipeline(root: Path, label: str, extra_args):
+    report = root / f"report-{label}.json"
+    cmd = [sys.executable, str(root / "scripts" / "process_raw_posts.py"), "--report", str(report), *extra_args]
+    start = time.perf_counter()
+    proc = subprocess.run(cmd, cwd=root, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, text=True)
+    elapsed = time.perf_counter() - start
+    if proc.returncode != 0:
+        print(proc.stdout)
+        raise RuntimeError(f"pipeline ({label}) exited with {proc.returncode}")
+    metrics = {f"pipeline.{label}.total": elapsed}
+    with report.open("r", encoding="utf-8") as f:
+        data = json.load(f)
+    for name, timer in data.get("timers", {}).items():
+        metrics[f"pipeline.{label}.{name}"] = timer["seconds"]
+    return metrics, data.get("counters", {})
+
+
+def best_of(repeat: int, fn):
+    best = None
+    for _ in range(max(1, repeat)):
+        start = time.perf_counter()
+        fn()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def micro_benchmarks(root: Path, repeat: int):
+    # import the copies under root so the modules' ROOT points at the corpus
+    sys.path.insert(0, str(root / "scripts"))
+    import sitemap
+    import process_raw_posts as prp
+    from post_store import PostStore
+    from site_config import SITE_URL
+    from related_posts import RelatedIndex
+    from list_pages import ListPages
+    from post_templates import PostRenderer
+
+    blog_dir = root / "data" / "BlogData"
+    meta = PostStore(blog_dir).load()
+    pages = []
+    for post in meta.get("posts", []):
+        path = root / post["path"]
+        pages.append((path.read_text(encoding="utf-8"), f"{SITE_URL}{post['path']}"))
+
+    sitemap_root = root / "bench-sitemap"
+    sitemap_root.mkdir(exist_ok=True)
+    scratch = root / "bench-scratch"
+    (scratch / "lists").mkdir(parents=True, exist_ok=True)
+    shutil.copy2(root / "index.html", scratch / "index.html")
+    source = scratch / "post.post"
+    source.write_text(
+        "---\ntitle: bench\ndescription: bench\ntags: 1/2\n---\n# topic\n"
+        + "\n\n".join(f"{_sentence(random.Random(n))}\n![](img{n}.png)" for n in range(20)),
+        encoding="utf-8",
+    )
+    renderer = PostRenderer()
+
+    def _sitemap():
+        # fresh directory each time so the write is measured too
+        for f in sitemap_root.glob("*.xml"):
+            f.unlink()
+        sitemap.update_sitemap(meta, sitemap_root, SITE_URL)
+
+    benches = {
+        "micro.parse_document": lambda: [prp.PostDocument(html) for html, _url in pages],
+        "micro.normalize_social_meta": lambda: [prp.normalize_social_meta(html, url) for html, url in pages],
+        "micro.update_sitemap": _sitemap,
+        "micro.related_posts": lambda: RelatedIndex(scratch, root / "data" / "Category.json").update(meta, full=True),
+        "micro.list_pages": lambda: ListPages(scratch, root / "data" / "Category.json", scratch / "index.html").update(meta, full=True),
+        "micro.render_template": lambda: [renderer.render_source(source) for _ in range(50)],
+    }
+    return {name: best_of(repeat, fn) for name, fn in benches.items()}
+
+
+def compare(results: dict, baseline: dict, threshold: float):
+    regressions = []
+    for name, value in sorted(results.items()):
+        base = baseline.get(name)
+        if base is None or max(base, value) < MIN_COMPARED_SECONDS:
+            continue
+        if value > base * (1 + threshold):
+            regressions.append((name, base, value))
+    return regressions
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark process_raw_posts.py on a synthetic corpus")
+    parser.add_argument("--posts", type=int, default=20, help="raw items to generate (default: 20)")
+    parser.add_argument("--images", type=int, default=3, help="images per item (default: 3)")
+    parser.add_argument("--resolution", default="1600x1200", help="image size WxH (default: 1600x1200)")
+    parser.add_argument("--seed", type=int, default=1, help="corpus RNG seed (default: 1)")
+    parser.add_argument("--repeat", type=int, default=3, help="runs per micro-benchmark, best kept (default: 3)")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="--jobs for the pipeline")
+    parser.add_argument("--no-avif", action="store_true", help="pass --no-avif to the pipeline")
+    parser.add_argument("--baseline", type=Path, help="baseline JSON to compare against")
+    parser.add_argument("--save-baseline", type=Path, help="write the results as a baseline JSON")
+    parser.add_argument("--threshold", type=float, default=0.25, help="allowed slowdown ratio (default: 0.25)")
+    parser.add_argument("--output", type=Path, help="write the full results JSON here")
+    parser.add_argument("--keep", action="store_true", help="keep the temporary ROOT for inspection")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    try:
+        width, height = (int(v) for v in args.resolution.lower().split("x"))
+    except ValueError:
+        print(f"Invalid --resolution {args.resolution!r}, expected WxH")
+        return 2
+
+    root = Path(tempfile.mkdtemp(prefix="blog-bench-"))
+    try:
+        sys.path.insert(0, str(SCRIPTS_DIR))
+        start = time.perf_counter()
+        build_root(root, args.posts, args.images, (width, height), args.seed)
+        print(f"Corpus: {args.posts} post(s) x {args.images} image(s) at {width}x{height} "
+              f"in {root} ({time.perf_counter() - start:.1f}s to generate)")
+        sys.path.remove(str(SCRIPTS_DIR))
+
+        pipeline_args = ["--jobs", str(args.jobs), "--item-workers", "4"] + (["--no-avif"] if args.no_avif else [])
+        metrics = {}
+        cold, counters = run_pipeline(root, "cold", pipeline_args)
+        metrics.update(cold)
+        warm, _ = run_pipeline(root, "warm", pipeline_args)
+        metrics.update(warm)
+        metrics.update(micro_benchmarks(root, args.repeat))
+    finally:
+        if args.keep:
+            print(f"Kept {root}")
+        else:
+            shutil.rmtree(root, ignore_errors=True)
+
+    results = {
+        "corpus": {"posts": args.posts, "images": args.images, "resolution": args.resolution, "seed": args.seed},
+        "metrics": {k: round(v, 4) for k, v in sorted(metrics.items())},
+        "counters": counters,
+    }
+    for name, value in results["metrics"].items():
+        print(f"  {name:<40} {value:9.4f}s")
+
+    if args.output:
+        args.output.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+    if args.save_baseline:
+        args.save_baseline.write_text(json.dumps(results, ensure_ascii=False, indent=2), encoding="utf-8")
+        print(f"Baseline saved to {args.save_baseline}")
+
+    if args.baseline:
+        with args.baseline.open("r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if baseline.get("corpus") != results["corpus"]:
+            print(f"Warning: baseline corpus {baseline.get('corpus')} differs from {results['corpus']}")
+        regressions = compare(results["metrics"], baseline.get("metrics", {}), args.threshold)
+        if regressions:
+            print(f"Regressions over {args.threshold:.0%}:")
+            for name, base, value in regressions:
+                print(f"  {name}: {base:.4f}s -> {value:.4f}s ({value / base - 1:+.0%})")
+            return 1
+        print(f"No regressions over {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
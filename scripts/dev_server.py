@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+"""
+Local preview server and file watcher for process_raw_posts.py --watch.
+
+DevServer serves the repository over HTTP from a background thread:
+
+- links to the live site (SITE_URL) in HTML, CSS, JS, JSON and XML are
+  rewritten to the local server, so pages load the local style.css,
+  script.js and data/ instead of what is deployed
+- mounts map URL prefixes to other directories (e.g. /preview/)
+- every response is sent with "Cache-Control: no-cache" and an ETag made
+  from the file's mtime and size: the browser revalidates on each load,
+  gets a 304 for anything unchanged and sees a rebuild on the next reload
+- paths under an immutable prefix (content-addressed assets, whose names
+  change with their content) are cached for a year without revalidation
+
+Poller compares stat snapshots of a few directories, which needs no
+platform-specific notification API and is cheap for trees of this size.
+"""
+import io
+import os
+import sys
+import threading
+from pathlib import Path
+from functools import partial
+from urllib.parse import quote
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+from site_config import SITE_URL
+
+CACHE_CONTROL = "no-cache"
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REWRITE_TYPES = ("text/", "application/javascript", "application/json", "application/xml")
+
+
+class PreviewHandler(SimpleHTTPRequestHandler):
+    mounts = {}
+    site_url = SITE_URL
+    immutable = ()
+
+    def translate_path(self, path):
+        for prefix, directory in self.mounts.items():
+            if path.startswith(prefix):
+                saved, self.directory = self.directory, str(directory)
+                try:
+                    return super().translate_path("/" + path[len(prefix):])
+                finally:
+                    self.directory = saved
+        return super().translate_path(path)
+
+    def end_headers(self):
+        immutable = self.path.startswith(self.immutable) if self.immutable else False
+        self.send_header("Cache-Control", IMMUTABLE_CACHE_CONTROL if immutable else CACHE_CONTROL)
+        etag = getattr(self, "_etag", None)
+        if etag:
+            self.send_header("ETag", etag)
+        super().end_headers()
+
+    def send_head(self):
+        self._etag = None
+        path = self.translate_path(self.path)
+        if os.path.isdir(path):
+            return super().send_head()
+        try:
+            st = os.stat(path)
+        except OSError:
+            return super().send_head()
+        self._etag = f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+        if self._etag in self.headers.get("If-None-Match", ""):
+            self.send_response(304)
+            self.end_headers()
+            return None
+        ctype = self.guess_type(path)
+        if not ctype.startswith(REWRITE_TYPES):
+            return super().send_head()
+        try:
+            body = Path(path).read_bytes()
+        except OSError:
+            return super().send_head()
+        # "https://.../Base/style.css" and "${base}/data/..." both become root-relative
+        body = body.replace(self.site_url.rstrip("/").encode("utf-8"), b"")
+        self.send_response(200)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(body)))
+        self.send_header("Last-Modified", self.date_time_string(st.st_mtime))
+        self.end_headers()
+        return io.BytesIO(body)
+
+    def log_request(self, code="-", size="-"):
+        # only failures; a page load is dozens of 200/304 lines otherwise
+        try:
+            failed = int(code) >= 400
+        except (TypeError, ValueError):
+            failed = True
+        if failed:
+            super().log_request(code, size)
+
+
+class DevServer:
+    def __init__(
+        self, root: Path, port: int = 8000, host: str = "127.0.0.1", mounts=None, site_url: str = SITE_URL, immutable=(),
+    ):
+        self.root = Path(root)
+        self.host = host
+        self.port = port
+        handler = type("Handler", (PreviewHandler,), {
+            "mounts": dict(mounts or {}), "site_url": site_url, "immutable": tuple(immutable),
+        })
+        self._handler = partial(handler, directory=str(self.root))
+        self._httpd = None
+
+    def url(self, path: str = "") -> str:
+        return f"http://{self.host}:{self.port}/{quote(path)}"
+
+    def start(self):
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler)
+        # port 0 picks a free port
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+
+    def stop(self):
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class Poller:
+    """Reports files added, changed or removed below roots since the last poll()."""
+
+    def __init__(self, roots, ignore=()):
+        self.roots = [Path(r) for r in roots]
+        self.ignore = {str(Path(p)) for p in ignore}
+        self._snapshot = self.snapshot()
+
+    def snapshot(self):
+        files = {}
+        for root in self.roots:
+            for dirpath, dirnames, filenames in os.walk(root):
+                dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) not in self.ignore]
+                for name in filenames:
+                    path = os.path.join(dirpath, name)
+                    try:
+                        st = os.stat(path)
+                    except OSError:
+                        continue
+                    files[path] = (st.st_size, st.st_mtime_ns)
+        return files
+
+    def poll(self):
+        current = self.snapshot()
+        previous = self._snapshot
+        self._snapshot = current
+        changed = {p for p in current.keys() | previous.keys() if current.get(p) != previous.get(p)}
+        return {Path(p) for p in changed}
+
+
+def main(argv=None):
+    """Serve the repository (without watching anything) on the given port."""
+    args = sys.argv[1:] if argv is None else argv
+    port = int(args[0]) if args else 8000
+    root = Path(__file__).resolve().parent.parent
+    server = DevServer(root, port, immutable=("/data/BlogData/assets/",))
+    server.start()
+    print(f"Serving {root} at {server.url()} (Ctrl+C to stop)")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
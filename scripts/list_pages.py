@@ -0,0 +1,202 @@
+#!/usr/bin/env python3
+"""
+Pre-rendered post lists for the home page.
+
+- lists/all-N.html        HTML fragments of <article class="blog-item"> cards,
+- lists/tag-<id>-N.html   the same markup script.js used to build, newest first
+- lists/lists.json        digests of every page's members, used to skip pages
+                          whose membership did not change
+- index.html              the tag tabs and the newest cards of the full list,
+                          rendered between the list-pages markers so the first
+                          paint needs no fetch at all
+
+Pages are numbered from the oldest post (PAGE_SIZE per page), so a new post
+only changes the newest page of each list it belongs to. The newest page can
+be short; the home page then also embeds the page before it.
+"""
+import json
+import html
+import hashlib
+from pathlib import Path
+from datetime import datetime, timedelta, timezone
+
+from post_store import dump_json, write_if_changed
+from site_config import SITE_URL
+from related_posts import load_category_names
+
+PAGE_SIZE = 20
+LISTS_DIR_NAME = "lists"
+STATE_NAME = "lists.json"
+LIST_START = "<!-- list-pages:start -->"
+LIST_END = "<!-- list-pages:end -->"
+TITLE_SUFFIX = " - レイミーの秘密基地"
+# dates are shown as the readers see them
+DISPLAY_TZ = timezone(timedelta(hours=9))
+
+
+def _format_date(value):
+    if not value:
+        return ""
+    try:
+        dt = datetime.fromisoformat(str(value).replace("Z", "+00:00"))
+    except ValueError:
+        return str(value)
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(DISPLAY_TZ)
+    return dt.strftime("%Y/%m/%d")
+
+
+def _card_fields(post):
+    title = post.get("title") or f"Post {post.get('id')}"
+    if title.endswith(TITLE_SUFFIX):
+        title = title[: -len(TITLE_SUFFIX)]
+    return {
+        "href": f"{SITE_URL}{post.get('path', '')}",
+        "title": title,
+        "date": _format_date(post.get("date")),
+        "summary": post.get("summary") or "",
+    }
+
+
+def render_card(post) -> str:
+    f = {k: html.escape(v) for k, v in _card_fields(post).items()}
+    return (
+        '<article class="blog-item">\n'
+        '  <div class="blog-item-layout">\n'
+        '    <div class="blog-item-left">\n'
+        '      <div class="blog-item-title">\n'
+        f'        <h3><a href="{f["href"]}">{f["title"]}</a></h3>\n'
+        '      </div>\n'
+        f'      <div class="blog-item-date">{f["date"]}</div>\n'
+        '    </div>\n'
+        '    <div class="blog-item-separator"></div>\n'
+        '    <div class="blog-item-right">\n'
+        f'      <div class="blog-item-summary">{f["summary"]}</div>\n'
+        '    </div>\n'
+        '  </div>\n'
+        '</article>\n'
+    )
+
+
+def render_page(posts) -> str:
+    # newest first inside a page, like the list it is appended to
+    return "".join(render_card(p) for p in sorted(posts, key=lambda p: p["id"], reverse=True))
+
+
+def _page_digest(posts):
+    fields = [[p["id"], _card_fields(p)] for p in posts]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+
+class ListPages:
+    def __init__(self, blog_dir: Path, category_file: Path, index_file: Path, page_size: int = PAGE_SIZE):
+        self.blog_dir = Path(blog_dir)
+        self.category_file = Path(category_file)
+        self.index_file = Path(index_file)
+        self.page_size = page_size
+        self.lists_dir = self.blog_dir / LISTS_DIR_NAME
+        self.state_file = self.lists_dir / STATE_NAME
+
+    def page_file(self, key: str, page: int) -> Path:
+        return self.lists_dir / f"{key}-{page}.html"
+
+    def _load_state(self):
+        try:
+            with self.state_file.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def build_lists(self, meta: dict):
+        """Return (lists {key: posts oldest first}, tabs [(tag, name)])."""
+        posts = sorted(
+            (p for p in meta.get("posts", []) if p.get("published", True) is True and p.get("id") is not None),
+            key=lambda p: p["id"],
+        )
+        names = load_category_names(self.category_file)
+        lists = {"all": posts}
+        tags = sorted(set(names) | {t for p in posts for t in p.get("tags") or [] if isinstance(t, int)})
+        tabs = []
+        for tag in tags:
+            members = [p for p in posts if tag in (p.get("tags") or [])]
+            if members:
+                lists[f"tag-{tag}"] = members
+                tabs.append((tag, names.get(tag) or f"タグ {tag}"))
+        return lists, tabs
+
+    def update(self, meta: dict, full: bool = False) -> int:
+        """Rewrite the fragments whose members changed and the index.html block. Returns files written."""
+        lists, tabs = self.build_lists(meta)
+        state = {} if full else self._load_state().get("lists", {})
+        new_state = {}
+        written = 0
+        keep = set()
+        for key, members in lists.items():
+            chunks = [members[i:i + self.page_size] for i in range(0, len(members), self.page_size)]
+            digests = [_page_digest(chunk) for chunk in chunks]
+            old = state.get(key, {}).get("pages", [])
+            for n, (chunk, digest) in enumerate(zip(chunks, digests), start=1):
+                path = self.page_file(key, n)
+                keep.add(path.name)
+                if n <= len(old) and old[n - 1] == digest and path.exists():
+                    continue
+                if write_if_changed(path, render_page(chunk).encode("utf-8")):
+                    written += 1
+            version = hashlib.sha1("".join(digests).encode("utf-8")).hexdigest()[:8]
+            new_state[key] = {"total": len(members), "pages": digests, "version": version}
+
+        if self.lists_dir.exists():
+            for stale in self.lists_dir.glob("*.html"):
+                if stale.name not in keep:
+                    stale.unlink()
+        write_if_changed(self.state_file, dump_json({"pageSize": self.page_size, "lists": new_state}))
+
+        if self.update_home(lists, tabs, new_state):
+            written += 1
+        return written
+
+    def _home_block(self, lists, tabs, state, indent: str) -> str:
+        def _tab(tag, label, active=False):
+            key = "all" if tag == "all" else f"tag-{tag}"
+            info = state[key]
+            cls = "tag-tab active" if active else "tag-tab"
+            return (
+                f'<button class="{cls}" data-tag="{tag}" data-pages="{len(info["pages"])}" '
+                f'data-total="{info["total"]}" data-version="{info["version"]}">{html.escape(label)}</button>'
+            )
+
+        posts = lists["all"]
+        pages = len(state["all"]["pages"])
+        # the newest page, plus the one before it when the newest is short
+        shown = 1 if pages <= 1 or len(posts) - (pages - 1) * self.page_size >= self.page_size else 2
+        embedded = posts[(pages - shown) * self.page_size:]
+
+        lines = ['<div class="tag-filter-tabs">', "  " + _tab("all", "すべて", active=True)]
+        lines += ["  " + _tab(tag, name) for tag, name in tabs]
+        lines.append("</div>")
+        lines.append(
+            f'<div class="blog-list-items" aria-live="polite" data-list="all" '
+            f'data-page-size="{self.page_size}" data-next-page="{max(0, pages - shown)}">'
+        )
+        if embedded:
+            lines += ["  " + line for line in render_page(embedded).splitlines()]
+        else:
+            lines.append('  <div class="muted">投稿が見つかりません。</div>')
+        lines.append("</div>")
+        return "\n".join(indent + line for line in lines)
+
+    def update_home(self, lists, tabs, state) -> bool:
+        try:
+            text = self.index_file.read_text(encoding="utf-8")
+        except OSError:
+            return False
+        start = text.find(LIST_START)
+        end = text.find(LIST_END, start + 1)
+        if start < 0 or end < 0:
+            print(f"Warning: {self.index_file.name} has no {LIST_START} block; home page list not pre-rendered")
+            return False
+        line_start = text.rfind("\n", 0, start) + 1
+        indent = text[line_start:start] if not text[line_start:start].strip() else ""
+        block = self._home_block(lists, tabs, state, indent)
+        updated = text[:start + len(LIST_START)] + "\n" + block + "\n" + indent + text[end:]
+        return write_if_changed(self.index_file, updated.encode("utf-8"))
@@ -0,0 +1,221 @@
+#!/usr/bin/env python3
+"""
+MP4/MOV box reading for the videos process_raw_posts.py copies into posts.
+
+A file whose moov box (the index of every sample) comes after the media data
+makes the browser download the whole file, or guess at range requests,
+before playback can start. faststart() writes a copy with moov moved in
+front of the first mdat:
+
+- moov is read into memory (it is small; the media data is not) and every
+  chunk offset in its stco/co64 tables is moved by the distance its box moved
+- the remaining boxes are streamed in COPY_CHUNK_SIZE pieces, in order
+
+probe() reads the duration from mvhd and the display size from the first
+track header with one, so <video> tags can get width and height.
+
+    python scripts/mp4_faststart.py in.mp4 [out.mp4]
+"""
+import os
+import sys
+import struct
+import shutil
+from pathlib import Path
+
+COPY_CHUNK_SIZE = 1 << 20
+# boxes on the path from moov to the chunk offset tables
+CONTAINER_BOXES = {b"moov", b"trak", b"mdia", b"minf", b"stbl"}
+FASTSTART_EXTS = (".mp4", ".m4v", ".mov")
+
+
+class BoxError(ValueError):
+    pass
+
+
+def iter_boxes(f, start: int, end: int):
+    """Yields (type, offset, header size, total size) of the boxes in f between start and end."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        size, kind = struct.unpack(">I4s", f.read(8))
+        header = 8
+        if size == 1:
+            size = struct.unpack(">Q", f.read(8))[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise BoxError(f"bad {kind!r} box at offset {pos}")
+        yield kind, pos, header, size
+        pos += size
+
+
+def _top_level(f):
+    f.seek(0, os.SEEK_END)
+    return list(iter_boxes(f, 0, f.tell()))
+
+
+def _children(data, start: int, end: int):
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from(">Q", data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            raise BoxError(f"bad {kind!r} box in moov at {pos}")
+        yield kind, pos, header, size
+        pos += size
+
+
+def _find(data, start: int, end: int, path):
+    """Payload ranges of the boxes at path (a list of types) below data[start:end]."""
+    for kind, pos, header, size in _children(data, start, end):
+        if kind != path[0]:
+            continue
+        if len(path) == 1:
+            yield pos + header, pos + size
+        else:
+            yield from _find(data, pos + header, pos + size, path[1:])
+
+
+def _patch_chunk_offsets(moov: bytearray, start: int, end: int, shift):
+    """Apply shift(old offset) -> new offset to every stco/co64 entry below moov[start:end], in place."""
+    for kind, pos, header, size in _children(moov, start, end):
+        if kind == b"cmov":
+            raise BoxError("compressed moov")
+        if kind in CONTAINER_BOXES:
+            _patch_chunk_offsets(moov, pos + header, pos + size, shift)
+        elif kind in (b"stco", b"co64"):
+            fmt = ">I" if kind == b"stco" else ">Q"
+            width = struct.calcsize(fmt)
+            count = struct.unpack_from(">I", moov, pos + header + 4)[0]
+            entries = pos + header + 8
+            if entries + count * width > pos + size:
+                raise BoxError(f"{kind!r} table runs past its box")
+            for i in range(count):
+                at = entries + i * width
+                offset = shift(struct.unpack_from(fmt, moov, at)[0])
+                if kind == b"stco" and offset > 0xFFFFFFFF:
+                    # would need stco -> co64, which resizes moov; keep the file as it is
+                    raise BoxError("chunk offset no longer fits stco")
+                struct.pack_into(fmt, moov, at, offset)
+
+
+def faststart(src: Path, dest: Path) -> bool:
+    """
+    Write src to dest with moov in front of the media data. Returns False (and
+    writes nothing) when src is fast-start already or not an MP4 this can move;
+    raises BoxError for a damaged file.
+    """
+    src, dest = Path(src), Path(dest)
+    with open(src, "rb") as f:
+        boxes = _top_level(f)
+        kinds = [b[0] for b in boxes]
+        if kinds.count(b"moov") != 1 or b"mdat" not in kinds:
+            return False
+        moov_index = kinds.index(b"moov")
+        first_mdat = kinds.index(b"mdat")
+        if first_mdat > moov_index:
+            return False
+
+        moov_box = boxes[moov_index]
+        f.seek(moov_box[1])
+        moov = bytearray(f.read(moov_box[3]))
+        order = boxes[:first_mdat] + [moov_box] + [b for b in boxes[first_mdat:] if b is not moov_box]
+
+        # where every box other than moov starts in the new file
+        moved = []
+        pos = 0
+        for kind, offset, header, size in order:
+            if kind != b"moov":
+                moved.append((offset, offset + size, pos - offset))
+            pos += size
+
+        def shift(offset):
+            for start, end, delta in moved:
+                if start <= offset < end:
+                    return offset + delta
+            raise BoxError(f"chunk offset {offset} is outside every box")
+
+        _patch_chunk_offsets(moov, moov_box[2], len(moov), shift)
+
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        try:
+            with open(tmp, "wb") as out:
+                for kind, offset, _header, size in order:
+                    if kind == b"moov":
+                        out.write(moov)
+                        continue
+                    f.seek(offset)
+                    remaining = size
+                    while remaining:
+                        chunk = f.read(min(COPY_CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise BoxError("file ends inside a box")
+                        out.write(chunk)
+                        remaining -= len(chunk)
+            shutil.copystat(src, tmp)
+            os.replace(tmp, dest)
+        except BaseException:
+            if tmp.exists():
+                tmp.unlink()
+            raise
+    return True
+
+
+def probe(path: Path):
+    """{"duration": seconds, "width": px, "height": px} from moov; missing keys were not found."""
+    info = {}
+    with open(path, "rb") as f:
+        moov_box = next((b for b in _top_level(f) if b[0] == b"moov"), None)
+        if moov_box is None:
+            return info
+        f.seek(moov_box[1])
+        moov = f.read(moov_box[3])
+    body = (moov_box[2], len(moov))
+
+    for start, end in _find(moov, *body, [b"mvhd"]):
+        version = moov[start]
+        if version == 1:
+            timescale, duration = struct.unpack_from(">IQ", moov, start + 20)
+        else:
+            timescale, duration = struct.unpack_from(">II", moov, start + 12)
+        if timescale and duration != (0xFFFFFFFFFFFFFFFF if version == 1 else 0xFFFFFFFF):
+            info["duration"] = duration / timescale
+
+    for start, end in _find(moov, *body, [b"trak", b"tkhd"]):
+        # matrix and 16.16 width/height close the box in both versions
+        matrix = struct.unpack_from(">9i", moov, end - 44)
+        width, height = (v >> 16 for v in struct.unpack_from(">II", moov, end - 8))
+        if not (width and height):
+            continue
+        a, b = matrix[0], matrix[1]
+        if a == 0 and b != 0:
+            # rotated by 90 or 270 degrees
+            width, height = height, width
+        info["width"], info["height"] = width, height
+        break
+    return info
+
+
+def main(argv=None):
+    args = sys.argv[1:] if argv is None else argv
+    if not args or len(args) > 2:
+        print("usage: mp4_faststart.py in.mp4 [out.mp4]")
+        return 2
+    src = Path(args[0])
+    dest = Path(args[1]) if len(args) > 1 else src
+    print(probe(src))
+    if faststart(src, dest):
+        print(f"moov moved to the front: {dest}")
+    else:
+        print("already fast-start (or nothing to move)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+posts.json storage: an append-only journal of post records plus compaction
+into the files the site serves.
+
+- posts.journal.jsonl  one {"op": "put", "post": {...}} record per line,
+                       appended (and fsynced) as each post is processed
+- posts.json           full snapshot, kept for the sitemap and older pages
+- posts-index.json     published posts as {id, date, tags, page}
+- posts-N.json         published posts with id in ((N-1)*PAGE_SIZE, N*PAGE_SIZE]
+
+Pages are chunked by id so adding a post only changes the last page. Every
+output file is written to a temp file and renamed into place, and only
+when its bytes change.
+"""
+import os
+import json
+from pathlib import Path
+
+from site_config import atomic_write_bytes
+
+PAGE_SIZE = 20
+JOURNAL_NAME = "posts.journal.jsonl"
+SNAPSHOT_NAME = "posts.json"
+INDEX_NAME = "posts-index.json"
+PAGE_PREFIX = "posts-"
+
+
+def write_if_changed(path: Path, data: bytes) -> bool:
+    try:
+        if path.read_bytes() == data:
+            return False
+    except OSError:
+        pass
+    atomic_write_bytes(path, data)
+    return True
+
+
+def dump_json(obj, indent=None) -> bytes:
+    # compact unless indented: the site serves most of these files as written
+    separators = (",", ":") if indent is None else None
+    text = json.dumps(obj, ensure_ascii=False, indent=indent, separators=separators)
+    return text.encode("utf-8")
+
+
+class PostStore:
+    def __init__(self, blog_dir: Path, page_size: int = PAGE_SIZE):
+        self.blog_dir = Path(blog_dir)
+        self.page_size = page_size
+        self.snapshot_file = self.blog_dir / SNAPSHOT_NAME
+        self.journal_file = self.blog_dir / JOURNAL_NAME
+        self.index_file = self.blog_dir / INDEX_NAME
+
+    def page_file(self, page: int) -> Path:
+        return self.blog_dir / f"{PAGE_PREFIX}{page}.json"
+
+    def page_of(self, post_id: int) -> int:
+        return max(1, (int(post_id) - 1) // self.page_size + 1)
+
+    def load(self) -> dict:
+        """Snapshot with any journal records not yet compacted applied on top."""
+        meta = {"lastId": 0, "posts": []}
+        if self.snapshot_file.exists():
+            with self.snapshot_file.open("r", encoding="utf-8") as f:
+                try:
+                    meta = json.load(f)
+                except Exception:
+                    meta = {"lastId": 0, "posts": []}
+        for record in self._journal_records():
+            self._apply(meta, record)
+        return meta
+
+    def _journal_records(self):
+        if not self.journal_file.exists():
+            return
+        with self.journal_file.open("r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    # a torn last line from an interrupted append; later lines cannot exist
+                    print(f"Warning: ignoring unreadable journal record in {self.journal_file}")
+                    return
+
+    @staticmethod
+    def _apply(meta: dict, record: dict):
+        if record.get("op") != "put":
+            return
+        post = record.get("post") or {}
+        posts = meta.setdefault("posts", [])
+        for i, existing in enumerate(posts):
+            if existing.get("id") == post.get("id"):
+                posts[i] = post
+                break
+        else:
+            posts.append(post)
+        meta["lastId"] = max(meta.get("lastId") or 0, post.get("id") or 0)
+
+    def append(self, meta: dict, post: dict):
+        """Record a post in the journal and in the in-memory meta."""
+        self.blog_dir.mkdir(parents=True, exist_ok=True)
+        record = {"op": "put", "post": post}
+        with self.journal_file.open("a", encoding="utf-8") as f:
+            start = f.tell()
+            try:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+            except OSError:
+                # a torn line would hide every record appended after it
+                f.truncate(start)
+                raise
+        self._apply(meta, record)
+
+    def compact(self, meta: dict) -> list:
+        """
+        Write posts.json, posts-index.json and the posts-N.json pages from meta,
+        then drop the journal. Returns the files whose bytes changed.
+        """
+        written = []
+        # journal records can arrive out of id order when items run concurrently
+        meta["posts"] = sorted(meta.get("posts", []), key=lambda p: p.get("id") or 0)
+        # the snapshot is committed and read by people; only the served pages are compact
+        if write_if_changed(self.snapshot_file, dump_json(meta, indent=2)):
+            written.append(self.snapshot_file)
+
+        published = sorted(
+            (p for p in meta.get("posts", []) if p.get("published", True) is True),
+            key=lambda p: p.get("id") or 0,
+        )
+        pages = {}
+        for post in published:
+            pages.setdefault(self.page_of(post.get("id") or 0), []).append(post)
+        page_count = max(pages) if pages else 0
+
+        for page in range(1, page_count + 1):
+            payload = {"page": page, "pageSize": self.page_size, "posts": pages.get(page, [])}
+            if write_if_changed(self.page_file(page), dump_json(payload)):
+                written.append(self.page_file(page))
+
+        index = {
+            "pageSize": self.page_size,
+            "pages": page_count,
+            "posts": [
+                {
+                    "id": p.get("id"),
+                    "date": p.get("date"),
+                    "tags": p.get("tags") or [],
+                    "page": self.page_of(p.get("id") or 0),
+                }
+                for p in published
+            ],
+        }
+        if write_if_changed(self.index_file, dump_json(index)):
+            written.append(self.index_file)
+
+        # pages past the end (e.g. after unpublishing the newest posts) go away
+        for stale in self.blog_dir.glob(f"{PAGE_PREFIX}*.json"):
+            suffix = stale.stem[len(PAGE_PREFIX):]
+            if suffix.isdigit() and int(suffix) > page_count:
+                stale.unlink()
+
+        if self.journal_file.exists():
+            self.journal_file.unlink()
+        return written
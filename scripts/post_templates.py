@@ -0,0 +1,231 @@
+#!/usr/bin/env python3
+"""
+Render posts from HTMLTemplates/ instead of filling the templates in by hand.
+
+Each template is compiled once into alternating literal and slot segments
+({{NAME}} placeholders) and kept until the file's mtime or size changes.
+Rendering walks the segments and yields chunks, so a post can be streamed
+straight to disk or joined into a string for process_raw_posts.py.
+
+A post source (*.post) is front matter followed by body blocks:
+
+    ---
+    title: 幻リプのルーミアがマジ熱い
+    description: 幻リプにルーミアが実装！！
+    tags: 3/4
+    ---
+    # 300 連引いた
+    リリースから約2年ずっとためていた石をここで解放だ～！
+    ![](G.png)
+    !video clip.mp4
+    !audio theme.mp3
+    https://example.com/
+
+"# " starts a topic, "![alt](file)" or "!image file" adds an image,
+"!video" / "!audio" add media, a line holding only a URL becomes a link and
+any other lines form a paragraph (ended by a blank line). Media are
+referenced by file stem; process_raw_posts.py resolves and converts them.
+Front matter values are escaped, paragraph text is inserted as HTML.
+"""
+import os
+import re
+import sys
+import time
+import html
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+TEMPLATE_DIR = ROOT / "HTMLTemplates"
+POST_SOURCE_EXT = ".post"
+
+SLOT_RE = re.compile(r"\{\{([A-Z_]+)\}\}")
+TOPIC_RE = re.compile(r"^#\s+(.*)$")
+IMAGE_MD_RE = re.compile(r"^!\[[^\]]*\]\(\s*([^)\s]+)\s*\)$")
+DIRECTIVE_RE = re.compile(r"^!(image|video|audio)\s+(\S.*)$")
+URL_LINE_RE = re.compile(r"^https?://\S+$")
+
+
+def compile_template(text: str):
+    # re.split with one group gives [literal, slot, literal, ..., literal]
+    return tuple(SLOT_RE.split(text))
+
+
+class TemplateSet:
+    def __init__(self, template_dir: Path = TEMPLATE_DIR):
+        self.template_dir = Path(template_dir)
+        self._compiled = {}  # name -> (mtime_ns, size, segments)
+        self.compiles = 0
+
+    def compiled(self, name: str):
+        path = self.template_dir / f"{name}.html"
+        st = path.stat()
+        cached = self._compiled.get(name)
+        if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+            return cached[2]
+        segments = compile_template(path.read_text(encoding="utf-8"))
+        self._compiled[name] = (st.st_mtime_ns, st.st_size, segments)
+        self.compiles += 1
+        return segments
+
+    def slots(self, name: str):
+        return self.compiled(name)[1::2]
+
+    def iter_render(self, name: str, values: dict):
+        """
+        Yield the chunks of template name. A value is a string or an iterable
+        of chunks (e.g. another iter_render); missing slots render empty.
+        """
+        segments = self.compiled(name)
+        for i, segment in enumerate(segments):
+            if not i % 2:
+                if segment:
+                    yield segment
+                continue
+            value = values.get(segment, "")
+            if isinstance(value, str):
+                yield value
+            else:
+                yield from value
+
+    def render(self, name: str, values: dict) -> str:
+        return "".join(self.iter_render(name, values))
+
+
+def parse_post_source(text: str):
+    """Split a post source into (front matter dict, topics [(name, blocks)])."""
+    lines = text.lstrip("\ufeff").splitlines()
+    front = {}
+    body = lines
+    if lines and lines[0].strip() == "---":
+        for i, line in enumerate(lines[1:], start=1):
+            if line.strip() == "---":
+                body = lines[i + 1:]
+                break
+            key, sep, value = line.partition(":")
+            if sep and key.strip():
+                front[key.strip().lower()] = value.strip()
+        else:
+            raise ValueError("front matter is not closed with ---")
+
+    topics = []
+    paragraph = []
+
+    def _blocks():
+        if not topics:
+            topics.append(("", []))
+        return topics[-1][1]
+
+    def _end_paragraph():
+        if paragraph:
+            _blocks().append(("text", "\n".join(paragraph)))
+            paragraph.clear()
+
+    for raw in body:
+        line = raw.strip()
+        if not line:
+            _end_paragraph()
+            continue
+        m = TOPIC_RE.match(line)
+        if m:
+            _end_paragraph()
+            topics.append((m.group(1).strip(), []))
+            continue
+        m = IMAGE_MD_RE.match(line)
+        if m:
+            _end_paragraph()
+            _blocks().append(("image", m.group(1)))
+            continue
+        m = DIRECTIVE_RE.match(line)
+        if m:
+            _end_paragraph()
+            _blocks().append((m.group(1), m.group(2).strip()))
+            continue
+        if URL_LINE_RE.match(line):
+            _end_paragraph()
+            _blocks().append(("url", line))
+            continue
+        paragraph.append(line)
+    _end_paragraph()
+    return front, topics
+
+
+def _format_tags(value: str) -> str:
+    parts = [p for p in re.split(r"[/,\s]+", value or "") if p]
+    return "/".join(parts)
+
+
+class PostRenderer:
+    """Assembles parent.html from a post source using a TemplateSet."""
+
+    def __init__(self, templates: TemplateSet = None):
+        self.templates = templates or TemplateSet()
+
+    def _block(self, kind: str, value: str):
+        t = self.templates
+        if kind == "text":
+            return t.iter_render("text", {"TEXT": value})
+        if kind == "url":
+            return t.iter_render("url", {"URL": html.escape(value)})
+        # image/video/audio templates add the directory and extension themselves
+        return t.iter_render(kind, {"SRC": html.escape(Path(value).stem)})
+
+    def _topic(self, name: str, blocks):
+        content = (chunk for kind, value in blocks for chunk in self._block(kind, value))
+        return self.templates.iter_render("blogTopic", {"TOPICNAME": html.escape(name), "CONTENT": content})
+
+    def iter_post(self, front: dict, topics):
+        t = self.templates
+        title = html.escape(front.get("title", ""))
+        description = html.escape(front.get("description", ""))
+        metadata = t.iter_render("meta", {
+            "TITLE": title,
+            "DESCRIPTION": description,
+            "TAGS": html.escape(_format_tags(front.get("tags", ""))),
+        })
+        header = t.iter_render("blogTitle", {"TITLE": title, "DESCRIPTION": description})
+        maintext = (chunk for part in [header] + [self._topic(n, b) for n, b in topics] for chunk in part)
+        return t.iter_render("parent", {"METADATA": metadata, "MAINTEXT": maintext})
+
+    def _load(self, source: Path):
+        front, topics = parse_post_source(Path(source).read_text(encoding="utf-8"))
+        if not front.get("title"):
+            raise ValueError(f"{source}: front matter has no title")
+        return front, topics
+
+    def render_source(self, source: Path) -> str:
+        return "".join(self.iter_post(*self._load(source)))
+
+    def render_to_file(self, source: Path, dest: Path):
+        """Stream the rendered post into dest (through a temp file)."""
+        front, topics = self._load(source)
+        dest = Path(dest)
+        tmp = dest.with_name(f".{dest.name}.tmp")
+        with tmp.open("w", encoding="utf-8", newline="") as f:
+            for chunk in self.iter_post(front, topics):
+                f.write(chunk)
+        os.replace(tmp, dest)
+
+
+def main(argv=None):
+    """Render the given .post files next to themselves (as .html) and report the rate."""
+    sources = [Path(a) for a in (sys.argv[1:] if argv is None else argv)]
+    if not sources:
+        print(f"usage: post_templates.py SOURCE{POST_SOURCE_EXT} [...]")
+        return 1
+    renderer = PostRenderer()
+    started = time.perf_counter()
+    rendered = 0
+    for source in sources:
+        try:
+            renderer.render_to_file(source, source.with_suffix(".html"))
+            rendered += 1
+        except (OSError, ValueError) as e:
+            print(f"Failed to render {source}: {e}")
+    elapsed = time.perf_counter() - started
+    rate = rendered / elapsed if elapsed > 0 else 0.0
+    print(f"Rendered {rendered} post(s) in {elapsed:.3f}s ({rate:.0f}/s, {renderer.templates.compiles} template compile(s))")
+    return 0 if rendered == len(sources) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,27 +1,117 @@
 #!/usr/bin/env python3
+import io
 import os
 import re
+import errno
 import sys
 import json
+import base64
 import shutil
+import hashlib
+import time
+import argparse
+import tempfile
+import threading
+import multiprocessing
 from pathlib import Path
 from datetime import datetime
-from urllib.parse import quote, urlsplit, urlunsplit
+from functools import partial
+from contextlib import contextmanager, nullcontext
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+from html.parser import HTMLParser
+from urllib.parse import quote, unquote, urlsplit, urlunsplit
 import xml.etree.ElementTree as ET
 
 try:
-    from PIL import Image
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+try:
+    from PIL import Image, ImageFilter, ImageOps, features
 except ImportError:
     print("Pillow is required. Install via: pip install Pillow")
     sys.exit(1)
 
+import sitemap
+from post_store import PostStore, dump_json, write_if_changed
+from site_config import SITE_URL, atomic_write_bytes, file_sha256
+from post_templates import POST_SOURCE_EXT, TEMPLATE_DIR, PostRenderer
+from related_posts import RelatedIndex
+from list_pages import ListPages
+from search_index import SearchIndex
+from run_stats import ItemProfiler, RunStats
+from dev_server import DevServer, Poller
+from asset_store import AssetStore
+from site_output import PRECOMPRESS_MANIFEST_FILE, SKIP_DIRS, Precompressor, minify_html, site_text_files
+import adaptive_webp
+import mp4_faststart
+
 ROOT = Path(__file__).resolve().parent.parent
 RAW_DIR = ROOT / "data" / "BlogData" / "RawData"
 BLOG_DIR = ROOT / "data" / "BlogData"
 META_FILE = BLOG_DIR / "posts.json"
+SOCIAL_MANIFEST_FILE = BLOG_DIR / "social-meta.manifest.json"
+# WebP options picked by --adaptive-webp, by source content hash
+WEBP_SETTINGS_FILE = BLOG_DIR / "webp-settings.json"
 ARCHIVE_DIR = RAW_DIR / "processed"
-SITEMAP_FILE = ROOT / "sitemap.xml"
-BASE_URL = "https://raymee675.github.io/Raymee-s-Secret-Base/"
+CATEGORY_FILE = ROOT / "data" / "Category.json"
+INDEX_FILE = ROOT / "index.html"
+
+WEBP_QUALITY = 85
+WEBP_METHOD = 6
+AVIF_QUALITY = 60
+AVIF_SPEED = 6
+AVIF_SUPPORTED = "avif" in features.get_supported_modules()
+
+# narrower copies cut from every image referenced by an <img>; only widths
+# below the source width are produced, the full-size .webp is the largest entry
+VARIANT_WIDTHS = (480, 960, 1600)
+IMAGE_SIZES = "(max-width: 960px) 100vw, 960px"
+
+# each <img> is shown as a blurred PLACEHOLDER_WIDTH-wide copy (a data: URI in
+# its background) until it loads; images after the first EAGER_IMAGES load lazily
+PLACEHOLDER_WIDTH = 16
+PLACEHOLDER_QUALITY = 40
+PLACEHOLDER_BLUR = 1
+EAGER_IMAGES = 1
+
+# social cards are cropped to the size the large summary card is shown at and
+# saved at the first quality that fits CARD_MAX_BYTES (the last one otherwise)
+CARD_SIZE = (1200, 630)
+CARD_QUALITIES = (90, 82, 74, 66, 58)
+CARD_MAX_BYTES = 200 * 1024
+
+# sources above MAX_PIXELS are scaled down to fit it before anything else;
+# DECODE_BUDGET_MB caps the decoded pixel data held by all workers at once
+MAX_PIXELS = 40_000_000
+DECODE_BUDGET_MB = 1024
+DECODE_BUDGET = None
+
+# encoded images are cached outside of data/ so CI can restore them between runs
+TRANSCODE_CACHE_DIR = ROOT / ".cache" / "transcode"
+TRANSCODE_CACHE_MAX_MB = 512
+TRANSCODE_CACHE = None
+# twitter-card.jpg renderer of the current run, shared by every post
+SOCIAL_CARDS = None
+# with --asset-store, post media and social cards go to data/BlogData/assets/<hash>
+ASSET_STORE = None
+# collapse whitespace between tags of the post HTML written (--no-minify keeps it as authored)
+MINIFY_HTML = True
+# compiled HTMLTemplates/, shared by every item rendered from a .post source
+POST_RENDERER = PostRenderer()
+# timers and counters of the current run, reported at the end of main()
+STATS = RunStats()
+RUN_REPORT_FILE = ROOT / ".cache" / "run-report.json"
+# posts are built in STAGING_DIR/<raw item name>/ and renamed into BLOG_DIR once
+# complete; STAGING_DIR/<raw item name>.json records the finished stages so an
+# interrupted run resumes
+STAGING_DIR = ROOT / ".cache" / "staging"
+# stands in for the post id in staged HTML until the post is recorded
+PENDING_ID = "pending-id"
+# --watch builds raw items here (served under /preview/) without recording or archiving them
+PREVIEW_DIR = ROOT / ".cache" / "preview"
+WATCH_INTERVAL = 0.5
 
 MEDIA_RE = re.compile(r'<(?:img|source|video|audio)[^>]+src\s*=\s*["\']([^"\']+)["\']', flags=re.I)
 IMG_SRC_RE = re.compile(r'<img[^>]+src\s*=\s*["\']([^"\']+)["\']', flags=re.I)
@@ -32,6 +122,14 @@ META_OG_URL_RE = re.compile(r'<meta\s+property=["\']og:url["\']\s+content=["\'](
 META_OG_IMAGE_RE = re.compile(r'<meta\s+property=["\']og:image["\']\s+content=["\']([^"\']*)["\'][^>]*>', flags=re.I)
 META_TWITTER_IMAGE_RE = re.compile(r'<meta\s+name=["\']twitter:image["\']\s+content=["\']([^"\']*)["\'][^>]*>', flags=re.I)
 P_TAG_RE = re.compile(r'<p>(.*?)<\/p>', flags=re.I | re.S)
+HEAD_TAG_RE = re.compile(r'<head[^>]*>', flags=re.I)
+META_TWITTER_CARD_RE = re.compile(r'<meta\s+name=["\']twitter:card["\'][^>]*>', flags=re.I)
+
+# media extension groups; the combined order is also the lookup priority for a stem
+IMAGE_EXTS = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.bmp', '.webp')
+VIDEO_EXTS = ('.mp4', '.mov', '.m4v', '.webm', '.ogv')
+AUDIO_EXTS = ('.mp3', '.wav', '.aac', '.ogg', '.flac', '.m4a')
+MEDIA_EXTS = IMAGE_EXTS + VIDEO_EXTS + AUDIO_EXTS
 
 
 def to_absolute_url(url: str, blog_url: str) -> str:
@@ -43,7 +141,7 @@ def to_absolute_url(url: str, blog_url: str) -> str:
     if s.startswith("//"):
         return f"https:{s}"
     if s.startswith("/"):
-        absolute = f"{BASE_URL.rstrip('/')}{s}"
+        absolute = f"{SITE_URL.rstrip('/')}{s}"
         return normalize_public_url(absolute)
     blog_dir_url = blog_url.rsplit("/", 1)[0] + "/"
     absolute = f"{blog_dir_url}{s}"
@@ -61,17 +159,15 @@ def normalize_public_url(url: str) -> str:
     return urlunsplit((parts.scheme, parts.netloc, normalized_path, normalized_query, normalized_fragment))
 
 
-def make_social_card_jpg(preferred_image: str, blog_url: str, html_path: Path = None) -> str:
-    if html_path is None:
-        return ""
-
-    image_ref = (preferred_image or "").strip()
+def resolve_card_source(preferred_image: str, html_path: Path):
+    # media references are URL-encoded; files on disk are not
+    image_ref = unquote((preferred_image or "").strip())
     if not image_ref:
-        return ""
+        return None
 
     source_path = None
     if image_ref.startswith("http://") or image_ref.startswith("https://"):
-        base = BASE_URL.rstrip("/")
+        base = SITE_URL.rstrip("/")
         if image_ref.startswith(base + "/"):
             rel = image_ref[len(base + "/"):]
             source_path = ROOT / rel.replace("/", os.sep)
@@ -81,97 +177,282 @@ def make_social_card_jpg(preferred_image: str, blog_url: str, html_path: Path =
         source_path = (html_path.parent / image_ref).resolve()
 
     if not source_path or not source_path.exists() or not source_path.is_file():
-        return ""
+        return None
 
     ext = source_path.suffix.lower()
     if ext not in (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".gif", ".tif", ".tiff"):
+        return None
+    return source_path
+
+
+def make_social_card_jpg(preferred_image: str, blog_url: str, html_path: Path = None) -> str:
+    if html_path is None:
+        return ""
+
+    source_path = resolve_card_source(preferred_image, html_path)
+    if not source_path:
         return ""
 
     card_path = html_path.parent / "images" / "twitter-card.jpg"
-    card_path.parent.mkdir(parents=True, exist_ok=True)
+    cards = SOCIAL_CARDS if SOCIAL_CARDS is not None else SocialCards(TRANSCODE_CACHE)
     try:
-        with Image.open(source_path) as im:
-            if im.mode not in ("RGB",):
-                im = im.convert("RGB")
-            im.save(card_path, format="JPEG", quality=90, optimize=True)
+        if ASSET_STORE is not None:
+            return ASSET_STORE.put_bytes(cards.card_bytes(source_path), ".jpg")
+        cards.write(source_path, card_path)
     except Exception as e:
         print(f"Warning: failed to create social card JPG from {source_path}: {e}")
         return ""
 
-    card_rel = card_path.relative_to(ROOT).as_posix()
-    card_url = f"{BASE_URL}{card_rel}"
-    return normalize_public_url(card_url)
+    # the card may be written into a staging directory; its URL is where it is published
+    return to_absolute_url("images/twitter-card.jpg", blog_url)
 
 
-def normalize_social_meta(html: str, blog_url: str, html_path: Path = None) -> str:
-    result = html
-    encoded_blog_url = normalize_public_url(blog_url)
+class PostDocument(HTMLParser):
+    """
+    Tokenizes a post once and records the source span of every start tag plus
+    the <head>, <title> and first <p> landmarks. Rewrites replace individual
+    tag texts or insert after a landmark; render() splices them into a single
+    output buffer, so untouched bytes are copied through verbatim.
 
-    def _replace_og_url(_match):
-        return f'<meta property="og:url" content="{encoded_blog_url}">'
+    The module regexes are applied to one tag's text at a time, which keeps
+    their matching rules (and therefore the output) unchanged.
+    """
 
-    if META_OG_URL_RE.search(result):
-        result = META_OG_URL_RE.sub(_replace_og_url, result)
-    else:
-        head_tag = re.search(r'<head[^>]*>', result, flags=re.I)
-        if head_tag:
-            insert_pos = head_tag.end()
-            result = result[:insert_pos] + f'\n    <meta property="og:url" content="{encoded_blog_url}">' + result[insert_pos:]
+    def __init__(self, html: str):
+        super().__init__(convert_charrefs=False)
+        self.html = html
+        self._line_starts = [0] + [m.end() for m in re.finditer("\n", html)]
+        self.tags = []  # [start, end, current text]
+        self.title_span = None  # (content start, content end, plain <title> tag)
+        self.title_end = None
+        self._title_open = None
+        self.first_p_span = None
+        self._open_p = None
+        self._inserts = []
+        self.feed(html)
+        self.close()
+
+    def _offset(self):
+        line, col = self.getpos()
+        return self._line_starts[line - 1] + col
+
+    def handle_starttag(self, tag, attrs):
+        text = self.get_starttag_text() or ""
+        start = self._offset()
+        self.tags.append([start, start + len(text), text])
+        if tag == "title" and self._title_open is None and self.title_end is None:
+            self._title_open = (start + len(text), text.lower() == "<title>")
+        elif tag == "p" and self.first_p_span is None and self._open_p is None and text.lower() == "<p>":
+            self._open_p = start + len(text)
+
+    def handle_startendtag(self, tag, attrs):
+        text = self.get_starttag_text() or ""
+        start = self._offset()
+        self.tags.append([start, start + len(text), text])
+
+    def handle_endtag(self, tag):
+        start = self._offset()
+        if tag == "title" and self._title_open is not None and self.title_end is None:
+            self.title_span = (self._title_open[0], start, self._title_open[1])
+            self.title_end = self.html.find(">", start) + 1
+        elif tag == "p" and self._open_p is not None:
+            self.first_p_span = (self._open_p, start)
+            self._open_p = None
+
+    def matching_tags(self, regex):
+        for tag in self.tags:
+            m = regex.search(tag[2])
+            if m:
+                yield tag, m
+
+    def first_group(self, regex):
+        for _tag, m in self.matching_tags(regex):
+            return m.group(1).strip()
+        return None
+
+    def sub_tags(self, regex, repl):
+        count = 0
+        for tag, _m in list(self.matching_tags(regex)):
+            tag[2] = regex.sub(repl, tag[2])
+            count += 1
+        return count
+
+    def insert_after(self, regex, text):
+        for tag, m in self.matching_tags(regex):
+            if m.start() == 0:
+                self._inserts.append((tag[0] + m.end(), text))
+                return True
+        return False
 
-    blog_dir_url = blog_url.rsplit("/", 1)[0] + "/"
-    first_img_src = ""
-    for src in IMG_SRC_RE.findall(result):
-        s = (src or "").strip()
-        if not s or s.startswith("data:"):
-            continue
-        if s.startswith("http://") or s.startswith("https://"):
-            if s.startswith(blog_dir_url):
-                first_img_src = s
-                break
-            continue
-        if s.startswith("//"):
-            continue
-        first_img_src = s
-        break
+    def title(self):
+        if not self.title_span or not self.title_span[2]:
+            return None
+        start, end, _plain = self.title_span
+        return self.html[start:end].strip()
+
+    def first_paragraph(self):
+        if not self.first_p_span:
+            return None
+        start, end = self.first_p_span
+        return self.html[start:end].strip()
+
+    def tag_contents(self, regex):
+        return [m.group(1) for _tag, m in self.matching_tags(regex)]
+
+    def rewrite_media(self, callback):
+        # callback(match, tag) gets the tag record too, so it can wrap the tag
+        for tag, _m in list(self.matching_tags(MEDIA_RE)):
+            tag[2] = MEDIA_RE.sub(lambda m, tag=tag: callback(m, tag), tag[2])
+
+    def add_attrs(self, tag, attrs: str):
+        # attrs (' name="value" ...') go right before the closing > or />
+        m = re.search(r"\s*/?>\Z", tag[2])
+        end = m.start() if m else len(tag[2])
+        tag[2] = tag[2][:end] + attrs + tag[2][end:]
+
+    def wrap_tag(self, tag, before: str, after: str):
+        self._inserts.append((tag[0], before))
+        self._inserts.append((tag[1], after))
+
+    def has_tag(self, name: str):
+        prefix = f"<{name}".lower()
+        return any(tag[2][:len(prefix)].lower() == prefix for tag in self.tags)
+
+    def preferred_image(self, blog_url: str) -> str:
+        blog_dir_url = blog_url.rsplit("/", 1)[0] + "/"
+        first_img_src = ""
+        for _tag, m in self.matching_tags(IMG_SRC_RE):
+            s = (m.group(1) or "").strip()
+            if not s or s.startswith("data:"):
+                continue
+            if s.startswith("http://") or s.startswith("https://"):
+                if s.startswith(blog_dir_url):
+                    first_img_src = s
+                    break
+                continue
+            if s.startswith("//"):
+                continue
+            first_img_src = s
+            break
 
-    og_image_match = META_OG_IMAGE_RE.search(result)
-    twitter_image_match = META_TWITTER_IMAGE_RE.search(result)
-    og_image_value = og_image_match.group(1).strip() if og_image_match else ""
-    twitter_image_value = twitter_image_match.group(1).strip() if twitter_image_match else ""
+        og_image_value = self.first_group(META_OG_IMAGE_RE) or ""
+        twitter_image_value = self.first_group(META_TWITTER_IMAGE_RE) or ""
 
-    preferred_image = first_img_src or og_image_value or twitter_image_value or "images/Icon.webp"
-    absolute_image_url = to_absolute_url(preferred_image, encoded_blog_url)
-    card_jpg_url = make_social_card_jpg(preferred_image, encoded_blog_url, html_path)
-    if card_jpg_url:
-        absolute_image_url = card_jpg_url
+        return first_img_src or og_image_value or twitter_image_value or "images/Icon.webp"
 
-    def _replace_og_image(_match):
-        return f'<meta property="og:image" content="{absolute_image_url}">'
+    def normalize_social_meta(self, blog_url: str, html_path: Path = None):
+        encoded_blog_url = normalize_public_url(blog_url)
 
-    def _replace_twitter_image(_match):
-        return f'<meta name="twitter:image" content="{absolute_image_url}">'
+        og_url_tag = f'<meta property="og:url" content="{encoded_blog_url}">'
+        if not self.sub_tags(META_OG_URL_RE, lambda _m: og_url_tag):
+            self.insert_after(HEAD_TAG_RE, f'\n    {og_url_tag}')
 
-    if META_OG_IMAGE_RE.search(result):
-        result = META_OG_IMAGE_RE.sub(_replace_og_image, result)
-    else:
-        title_tag = re.search(r'<title[^>]*>.*?<\/title>', result, flags=re.I | re.S)
-        if title_tag:
-            insert_pos = title_tag.end()
-            result = result[:insert_pos] + f'\n<meta property="og:image" content="{absolute_image_url}">' + result[insert_pos:]
+        preferred_image = self.preferred_image(blog_url)
+        absolute_image_url = to_absolute_url(preferred_image, encoded_blog_url)
+        card_jpg_url = make_social_card_jpg(preferred_image, encoded_blog_url, html_path)
+        if card_jpg_url:
+            absolute_image_url = card_jpg_url
 
-    if META_TWITTER_IMAGE_RE.search(result):
-        result = META_TWITTER_IMAGE_RE.sub(_replace_twitter_image, result)
-    else:
-        card_tag = re.search(r'<meta\s+name=["\']twitter:card["\'][^>]*>', result, flags=re.I)
-        if card_tag:
-            insert_pos = card_tag.end()
-            result = result[:insert_pos] + f'\n<meta name="twitter:image" content="{absolute_image_url}">' + result[insert_pos:]
+        og_image_tag = f'<meta property="og:image" content="{absolute_image_url}">'
+        if not self.sub_tags(META_OG_IMAGE_RE, lambda _m: og_image_tag):
+            if self.title_end is not None:
+                self._inserts.append((self.title_end, f'\n{og_image_tag}'))
 
-    return result
+        twitter_image_tag = f'<meta name="twitter:image" content="{absolute_image_url}">'
+        if not self.sub_tags(META_TWITTER_IMAGE_RE, lambda _m: twitter_image_tag):
+            self.insert_after(META_TWITTER_CARD_RE, f'\n{twitter_image_tag}')
+
+    def render(self) -> str:
+        # tags never overlap, so inserts (zero width) and replaced tags can be
+        # merged by position; inserts at a tag's start go in front of it
+        edits = [(pos, 0, pos, text) for pos, text in self._inserts]
+        edits += [(start, 1, end, text) for start, end, text in self.tags if text != self.html[start:end]]
+        edits.sort(key=lambda e: (e[0], e[1]))
+        out = []
+        cursor = 0
+        for start, _kind, end, text in edits:
+            out.append(self.html[cursor:start])
+            out.append(text)
+            cursor = end
+        out.append(self.html[cursor:])
+        return "".join(out)
+
+
+def preferred_social_image(html: str, blog_url: str) -> str:
+    return PostDocument(html).preferred_image(blog_url)
 
 
-def normalize_existing_posts_social_meta(meta: dict):
+def normalize_social_meta(html: str, blog_url: str, html_path: Path = None) -> str:
+    doc = PostDocument(html)
+    doc.normalize_social_meta(blog_url, html_path)
+    return doc.render()
+
+
+def file_fingerprint(path: Path, previous: dict = None):
+    """
+    Return {"mtime_ns", "size", "sha256"} for path, or None if it is missing.
+    The hash of previous is reused when mtime and size did not move.
+    """
+    STATS.count("stat_calls")
+    try:
+        st = path.stat()
+    except OSError:
+        return None
+    if previous and previous.get("mtime_ns") == st.st_mtime_ns and previous.get("size") == st.st_size:
+        return dict(previous)
+    return {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": file_sha256(path)}
+
+
+def _same_content(a: dict, b: dict) -> bool:
+    if not a or not b:
+        return a == b
+    return a.get("size") == b.get("size") and a.get("sha256") == b.get("sha256")
+
+
+def load_social_manifest():
+    if not SOCIAL_MANIFEST_FILE.exists():
+        return {"posts": {}}
+    with SOCIAL_MANIFEST_FILE.open("r", encoding="utf-8") as f:
+        try:
+            return json.load(f)
+        except Exception:
+            return {"posts": {}}
+
+
+def save_social_manifest(manifest):
+    BLOG_DIR.mkdir(parents=True, exist_ok=True)
+    with SOCIAL_MANIFEST_FILE.open("w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+
+def _social_inputs_unchanged(entry: dict, html_path: Path):
+    # returns the refreshed entry when html, card source and card are untouched
+    html_fp = file_fingerprint(html_path, entry.get("html"))
+    if not _same_content(html_fp, entry.get("html")):
+        return None
+    card = entry.get("card")
+    if card and card.get("settings") != card_settings():
+        # cards made with other settings are rendered again
+        return None
+    refreshed = {"html": html_fp, "card_source": None, "card": None}
+    for field in ("card_source", "card"):
+        previous = entry.get(field)
+        if not previous:
+            continue
+        fp = file_fingerprint(ROOT / previous["path"], previous)
+        if not _same_content(fp, previous):
+            return None
+        refreshed[field] = dict(previous, **fp)
+    return refreshed
+
+
+def normalize_existing_posts_social_meta(meta: dict, full: bool = False, minify: bool = False):
+    # minify (--minify-existing) also collapses the whitespace of already published posts
+    manifest = load_social_manifest()
+    previous_entries = {} if full or minify else manifest.get("posts", {})
+    entries = {}
     updated = 0
+    skipped = 0
     for post in meta.get("posts", []):
         rel_path = (post.get("path") or "").strip()
         if not rel_path:
@@ -180,39 +461,72 @@ def normalize_existing_posts_social_meta(meta: dict):
         if not html_path.exists() or html_path.suffix.lower() != ".html":
             continue
 
-        blog_url = normalize_public_url(f"{BASE_URL}{rel_path.replace(os.sep, '/')}")
+        previous = previous_entries.get(rel_path)
+        if previous:
+            refreshed = _social_inputs_unchanged(previous, html_path)
+            if refreshed:
+                entries[rel_path] = refreshed
+                skipped += 1
+                continue
+
+        blog_url = normalize_public_url(f"{SITE_URL}{rel_path.replace(os.sep, '/')}")
         try:
             original = html_path.read_text(encoding="utf-8")
-            normalized = normalize_social_meta(original, blog_url, html_path)
+            doc = PostDocument(original)
+            card_source = resolve_card_source(doc.preferred_image(blog_url), html_path)
+            card_source_fp = file_fingerprint(card_source) if card_source else None
+            doc.normalize_social_meta(blog_url, html_path)
+            normalized = doc.render()
+            if minify:
+                normalized = minify_html(normalized)
             if normalized != original:
                 html_path.write_text(normalized, encoding="utf-8")
                 updated += 1
         except Exception as e:
             print(f"Warning: failed to normalize social meta for {html_path}: {e}")
+            continue
+
+        entry = {"html": file_fingerprint(html_path), "card_source": None, "card": None}
+        card_path = html_path.parent / "images" / "twitter-card.jpg"
+        if card_source_fp and card_path.exists():
+            entry["card_source"] = dict(card_source_fp, path=card_source.relative_to(ROOT).as_posix())
+            entry["card"] = dict(
+                file_fingerprint(card_path), path=card_path.relative_to(ROOT).as_posix(), settings=card_settings()
+            )
+        entries[rel_path] = entry
+
+    def _content_only(posts):
+        return {
+            k: {f: (v[f] and {x: y for x, y in v[f].items() if x != "mtime_ns"}) for f in v}
+            for k, v in posts.items()
+        }
+
+    # mtimes change on every checkout; only rewrite the manifest when content moved
+    if full or _content_only(entries) != _content_only(manifest.get("posts", {})):
+        save_social_manifest({"posts": entries})
 
     if updated:
         print(f"Normalized social meta in {updated} existing post(s)")
+    if skipped:
+        print(f"Skipped {skipped} post(s) with unchanged social meta inputs")
     return updated
 
 
+def post_store():
+    return PostStore(BLOG_DIR)
+
+
 def load_meta():
-    if not META_FILE.exists():
-        return {"lastId": 0, "posts": []}
-    with META_FILE.open("r", encoding="utf-8") as f:
-        try:
-            return json.load(f)
-        except Exception:
-            return {"lastId": 0, "posts": []}
+    return post_store().load()
 
 
 def save_meta(meta):
-    BLOG_DIR.mkdir(parents=True, exist_ok=True)
-    with META_FILE.open("w", encoding="utf-8") as f:
-        json.dump(meta, f, ensure_ascii=False, indent=2)
+    # compacts the journal into posts.json and the paged posts-N.json shards
+    return post_store().compact(meta)
 
 
 def find_html(src_path: Path):
-    if src_path.is_file() and src_path.suffix.lower() == ".html":
+    if src_path.is_file() and src_path.suffix.lower() in (".html", POST_SOURCE_EXT):
         return src_path
     if src_path.is_dir():
         # prefer index.html or first html file
@@ -222,6 +536,9 @@ def find_html(src_path: Path):
                 return p
         for p in src_path.glob("*.html"):
             return p
+        # otherwise a post source rendered through HTMLTemplates/
+        for p in sorted(src_path.glob(f"*{POST_SOURCE_EXT}")):
+            return p
     return None
 
 
@@ -238,95 +555,962 @@ def make_slug(title):
 
 def update_sitemap(meta):
     """
-    Update sitemap.xml with all blog posts from meta
+    Update sitemap.xml (or the sharded sitemap-index.xml) with all blog posts from meta
     """
-    base_url = BASE_URL
-    
-    # Create sitemap manually for better compatibility and formatting
-    lines = [
-        '<?xml version="1.0" encoding="UTF-8"?>',
-        '<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
-    ]
-    
-    # Add main pages
-    main_urls = [
-        {"loc": base_url, "priority": "1.0"},
-        {"loc": f"{base_url}index.html", "priority": "1.0"}
+    result = sitemap.update_sitemap(meta, ROOT, SITE_URL)
+    if result["written"]:
+        print(f"Sitemap updated with {result['published']} published blog posts")
+    else:
+        print(f"Sitemap unchanged ({result['published']} published blog posts)")
+    return result
+
+
+COPY_CHUNK_SIZE = 1 << 20
+
+
+def _zero_copy(src: Path, dest: Path):
+    # copy_file_range (may reflink on btrfs/xfs) or sendfile keeps the bytes in
+    # the kernel; returns False when neither is available on this platform
+    with src.open("rb") as fsrc, dest.open("wb") as fdst:
+        if hasattr(os, "copy_file_range"):
+            def _copy(n):
+                return os.copy_file_range(fsrc.fileno(), fdst.fileno(), n)
+        elif hasattr(os, "sendfile"):
+            def _copy(n):
+                return os.sendfile(fdst.fileno(), fsrc.fileno(), None, n)
+        else:
+            return False
+        remaining = os.fstat(fsrc.fileno()).st_size
+        while remaining > 0:
+            sent = _copy(min(remaining, 1 << 30))
+            if sent == 0:
+                break
+            remaining -= sent
+        return remaining == 0
+
+
+def _chunked_copy(src: Path, dest: Path):
+    with src.open("rb") as fsrc, dest.open("wb") as fdst:
+        shutil.copyfileobj(fsrc, fdst, COPY_CHUNK_SIZE)
+
+
+def place_file(src: Path, dest: Path) -> str:
+    """
+    Put src at dest, trying a hardlink first, then a kernel zero-copy, then a
+    chunked copy. Returns the method used ("link", "zero-copy" or "copy").
+    dest is replaced atomically and never written through, since it may be a
+    hardlink shared with the cache or another post.
+    """
+    # a unique temp name: item workers may place the same shared file at once
+    fd, tmp = tempfile.mkstemp(prefix=f".{dest.name}.", suffix=".tmp", dir=dest.parent)
+    os.close(fd)
+    tmp = Path(tmp)
+    try:
+        try:
+            tmp.unlink()
+            os.link(src, tmp)
+            method = "link"
+        except OSError:
+            try:
+                method = "zero-copy" if _zero_copy(src, tmp) else None
+            except OSError:
+                method = None
+            if method is None:
+                _chunked_copy(src, tmp)
+                method = "copy"
+            shutil.copystat(src, tmp)
+        os.replace(tmp, dest)
+    except BaseException:
+        if tmp.exists():
+            tmp.unlink()
+        raise
+    return method
+
+
+class MediaPlacer:
+    """
+    Places copied media (videos, audio, other assets) into post directories
+    with place_file(). A destination already filled from the same source in
+    this run is skipped; counters report how many bytes were linked vs copied.
+    place_video() writes MP4/MOV files whose moov follows the media data
+    fast-start instead.
+    """
+
+    def __init__(self):
+        self._placed = {}
+        self.linked_bytes = 0
+        self.copied_bytes = 0
+        self.linked = 0
+        self.copied = 0
+        self.deduped = 0
+        self.faststart = 0
+
+    def _placed_before(self, src: Path, dest: Path) -> bool:
+        key = str(dest)
+        previous = self._placed.get(key)
+        if previous is not None and os.path.exists(key) and os.path.samefile(previous, src):
+            self.deduped += 1
+            return True
+        return False
+
+    def place(self, src: Path, dest: Path):
+        if self._placed_before(src, dest):
+            return "dedupe"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with STATS.timer("place_files"):
+            method = place_file(src, dest)
+        size = dest.stat().st_size
+        if method == "link":
+            self.linked += 1
+            self.linked_bytes += size
+        else:
+            self.copied += 1
+            self.copied_bytes += size
+        self._placed[str(dest)] = str(src)
+        return method
+
+    def place_video(self, src: Path, dest: Path):
+        if src.suffix.lower() not in mp4_faststart.FASTSTART_EXTS:
+            return self.place(src, dest)
+        if self._placed_before(src, dest):
+            return "dedupe"
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        try:
+            with STATS.timer("faststart"):
+                moved = mp4_faststart.faststart(src, dest)
+        except (OSError, mp4_faststart.BoxError) as e:
+            print(f"Warning: cannot make {src.name} fast-start ({e}); copying it as is")
+            moved = False
+        if not moved:
+            return self.place(src, dest)
+        print(f"Moved the index of {src.name} in front of its media data (fast-start)")
+        self.faststart += 1
+        self.copied += 1
+        self.copied_bytes += dest.stat().st_size
+        self._placed[str(dest)] = str(src)
+        return "faststart"
+
+    def summary(self):
+        return (
+            f"Media placement: {self.linked} linked ({self.linked_bytes} bytes), "
+            f"{self.copied} copied ({self.copied_bytes} bytes, {self.faststart} video(s) made fast-start), "
+            f"{self.deduped} duplicate(s) skipped"
+        )
+
+
+class TranscodeCache:
+    """
+    On-disk cache of encoded images keyed by source content hash plus encoder
+    settings. Hits are hardlinked (or copied) into place; the cache is pruned to
+    max_bytes by evicting the least recently used entries.
+    """
+
+    def __init__(self, cache_dir: Path, max_bytes: int):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._digests = {}
+
+    def source_digest(self, src: Path):
+        STATS.count("stat_calls")
+        st = src.stat()
+        memo = (str(src), st.st_size, st.st_mtime_ns)
+        digest = self._digests.get(memo)
+        if digest is None:
+            digest = self._digests[memo] = file_sha256(src)
+        return digest
+
+    def key(self, src: Path, settings: str):
+        try:
+            digest = self.source_digest(Path(src))
+        except OSError:
+            return None
+        return hashlib.sha256(f"{digest}|{settings}".encode("utf-8")).hexdigest()
+
+    def _entry(self, key: str, ext: str):
+        return self.cache_dir / key[:2] / f"{key}{ext}"
+
+    def fetch(self, key: str, ext: str, dest: Path):
+        entry = self._entry(key, ext)
+        if not entry.is_file():
+            self.misses += 1
+            return False
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        if not (dest.exists() and os.path.samefile(entry, dest)):
+            place_file(entry, dest)
+        # bump mtime so pruning treats the entry as recently used
+        os.utime(entry)
+        self.hits += 1
+        return True
+
+    def fetch_bytes(self, key: str, ext: str):
+        entry = self._entry(key, ext)
+        try:
+            data = entry.read_bytes()
+        except OSError:
+            self.misses += 1
+            return None
+        os.utime(entry)
+        self.hits += 1
+        return data
+
+    def store_bytes(self, key: str, ext: str, data: bytes):
+        try:
+            atomic_write_bytes(self._entry(key, ext), data)
+        except OSError as e:
+            print(f"Warning: failed to cache {key}{ext}: {e}")
+
+    def store(self, key: str, ext: str, produced: Path):
+        entry = self._entry(key, ext)
+        try:
+            entry.parent.mkdir(parents=True, exist_ok=True)
+            place_file(produced, entry)
+        except OSError as e:
+            print(f"Warning: failed to cache {produced}: {e}")
+
+    def prune(self):
+        if not self.cache_dir.exists():
+            return 0
+        entries = []
+        total = 0
+        for entry in self.cache_dir.rglob("*"):
+            if entry.is_file():
+                st = entry.stat()
+                entries.append((st.st_mtime, st.st_size, entry))
+                total += st.st_size
+        removed = 0
+        for _mtime, size, entry in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            try:
+                entry.unlink()
+            except OSError:
+                continue
+            total -= size
+            removed += 1
+        return removed
+
+
+def _file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+
+def _unlink_before_save(dest_image: Path):
+    # dest may be hardlinked to a cache entry; drop the link instead of truncating it
+    if dest_image.exists():
+        dest_image.unlink()
+
+
+class DecodeBudget:
+    """
+    Limits the decoded image bytes held at once across threads and worker
+    processes. An image larger than the whole budget still runs, alone.
+    Built on multiprocessing primitives so it can be handed to workers.
+    """
+
+    def __init__(self, limit_bytes: int, ctx=None):
+        ctx = ctx or multiprocessing.get_context("spawn")
+        self.limit = limit_bytes
+        self._cond = ctx.Condition()
+        self._used = ctx.Value("q", 0, lock=False)
+
+    @contextmanager
+    def hold(self, nbytes: int):
+        with self._cond:
+            while self._used.value and self._used.value + nbytes > self.limit:
+                self._cond.wait()
+            self._used.value += nbytes
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._used.value -= nbytes
+                self._cond.notify_all()
+
+
+def fit_pixels(size, max_pixels: int = None):
+    """size scaled down (aspect kept) so it has at most max_pixels pixels."""
+    max_pixels = max_pixels or MAX_PIXELS
+    w, h = size
+    if w * h <= max_pixels:
+        return (w, h)
+    scale = (max_pixels / (w * h)) ** 0.5
+    return (max(1, int(w * scale)), max(1, int(h * scale)))
+
+
+def _decoded_bytes(size) -> int:
+    # the decoded buffer plus one converted copy, at 4 bytes per pixel
+    return size[0] * size[1] * 4 * 2
+
+
+def _reset_peak_rss():
+    # Linux: writing 5 to clear_refs resets VmHWM, so the next read is this image's peak
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def _peak_rss_kib():
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1])
+    except (OSError, ValueError):
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource is not None else None
+
+
+@contextmanager
+def open_bounded(src_image: Path, max_size=None, cover=None):
+    """
+    Open src_image decoded at no more than fit_pixels(size) (or max_size, or
+    the smallest size still covering cover), holding DECODE_BUDGET while it is
+    in memory. JPEGs are reduced while decoding; other sources are resized
+    before any mode conversion. Yields the decoded image, already at the
+    final size.
+    """
+    with Image.open(src_image) as im:
+        target = fit_pixels(im.size)
+        if max_size and (max_size[0] < target[0] or max_size[1] < target[1]):
+            scale = min(max_size[0] / target[0], max_size[1] / target[1])
+            target = (max(1, int(target[0] * scale)), max(1, int(target[1] * scale)))
+        if cover and cover[0] < target[0] and cover[1] < target[1]:
+            scale = max(cover[0] / target[0], cover[1] / target[1])
+            target = (max(cover[0], round(target[0] * scale)), max(cover[1], round(target[1] * scale)))
+        if target != im.size and im.format == "JPEG":
+            # scale 1/2, 1/4 or 1/8 during decode, never below target
+            im.draft(None, target)
+        budget = DECODE_BUDGET
+        with budget.hold(_decoded_bytes(im.size)) if budget else nullcontext():
+            im.load()
+            if im.size != target:
+                if im.mode not in ("RGB", "RGBA", "L", "LA"):
+                    im = im.convert("RGBA" if "transparency" in im.info else "RGB")
+                im = im.resize(target, Image.LANCZOS)
+            yield im
+
+
+def card_settings():
+    quality = "/".join(str(q) for q in CARD_QUALITIES)
+    return f"card:jpeg:{CARD_SIZE[0]}x{CARD_SIZE[1]}:q{quality}:max{CARD_MAX_BYTES}:px{MAX_PIXELS}"
+
+
+def render_card_jpg(src_image: Path) -> bytes:
+    """src_image cropped to CARD_SIZE around its center, as JPEG bytes."""
+    with open_bounded(src_image, cover=CARD_SIZE) as im:
+        if im.mode in ("RGBA", "LA") or "transparency" in im.info:
+            # transparent areas would turn black in a JPEG
+            im = im.convert("RGBA")
+            background = Image.new("RGB", im.size, (255, 255, 255))
+            background.paste(im, mask=im.getchannel("A"))
+            im = background
+        elif im.mode != "RGB":
+            im = im.convert("RGB")
+        im = ImageOps.fit(im, CARD_SIZE, Image.LANCZOS)
+    for quality in CARD_QUALITIES:
+        buf = io.BytesIO()
+        im.save(buf, format="JPEG", quality=quality, optimize=True, progressive=True)
+        if buf.tell() <= CARD_MAX_BYTES:
+            break
+    return buf.getvalue()
+
+
+class SocialCards:
+    """
+    Renders twitter-card.jpg files. A card is rendered once per source content
+    and shared by every post using that source, within a run and across runs
+    through the transcode cache; card files are only written when their bytes
+    change.
+    """
+
+    def __init__(self, cache: TranscodeCache = None):
+        self.cache = cache
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self._rendered = {}  # key -> card bytes
+        self.encoded = 0
+        self.shared = 0
+        self.written = 0
+
+    def _key(self, src_image: Path):
+        if self.cache is not None:
+            key = self.cache.key(src_image, card_settings())
+            if key:
+                return key
+        return hashlib.sha256(f"{file_sha256(src_image)}|{card_settings()}".encode("utf-8")).hexdigest()
+
+    def card_bytes(self, src_image: Path) -> bytes:
+        key = self._key(src_image)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        # posts sharing a source wait for the first one instead of encoding it again
+        with key_lock:
+            data = self._rendered.get(key)
+            if data is not None:
+                self.shared += 1
+                return data
+            data = self.cache.fetch_bytes(key, ".jpg") if self.cache is not None else None
+            if data is None:
+                with STATS.timer("social_card"):
+                    data = render_card_jpg(src_image)
+                self.encoded += 1
+                STATS.count("social_cards_encoded")
+                if self.cache is not None:
+                    self.cache.store_bytes(key, ".jpg", data)
+            self._rendered[key] = data
+        return data
+
+    def write(self, src_image: Path, card_path: Path) -> bool:
+        if write_if_changed(card_path, self.card_bytes(src_image)):
+            self.written += 1
+            return True
+        return False
+
+    def summary(self):
+        return f"Social cards: {self.encoded} encoded, {self.shared} shared, {self.written} written"
+
+
+def variant_path(dest_image: Path, width: int = None, ext: str = ".webp") -> Path:
+    return dest_image.with_name(dest_image.stem + (f"-{width}w" if width else "") + ext)
+
+
+def image_targets(dest_image: Path, widths=(), avif: bool = False):
+    """(dest, format, width) for the full-size image and each width, in WebP and optionally AVIF."""
+    formats = [("WEBP", ".webp")] + ([("AVIF", ".avif")] if avif else [])
+    return [
+        (variant_path(dest_image, width, ext), fmt, width)
+        for fmt, ext in formats
+        for width in (None,) + tuple(widths)
     ]
-    
-    current_date = datetime.now().strftime('%Y-%m-%d')
-    
-    for url_info in main_urls:
-        lines.append('  <url>')
-        lines.append(f'    <loc>{url_info["loc"]}</loc>')
-        lines.append(f'    <lastmod>{current_date}</lastmod>')
-        lines.append('    <changefreq>weekly</changefreq>')
-        lines.append(f'    <priority>{url_info["priority"]}</priority>')
-        lines.append('  </url>')
-    
-    # Add blog posts
-    posts = meta.get('posts', [])
-    # Sort posts by date (newest first) for better SEO
-    sorted_posts = sorted(posts, key=lambda x: x.get('date', ''), reverse=True)
-    
-    published_count = 0
-    for post in sorted_posts:
-        if not post.get('published', True):
-            continue
-        
-        published_count += 1
-        post_url = f"{base_url}{post['path']}"
-        
-        # Extract date from ISO format
-        date_str = post.get('date', datetime.now().isoformat())
+
+
+def _encoder_options(fmt: str):
+    if fmt == "AVIF":
+        return {"quality": AVIF_QUALITY, "speed": AVIF_SPEED}
+    return {"quality": WEBP_QUALITY, "method": WEBP_METHOD}
+
+
+def _cache_settings(fmt: str, width: int = None, adaptive: bool = False):
+    if fmt == "AVIF":
+        settings = f"avif:q{AVIF_QUALITY}:s{AVIF_SPEED}"
+    elif adaptive:
+        settings = f"webp:adaptive:{adaptive_webp.params_signature()}"
+    else:
+        settings = f"webp:q{WEBP_QUALITY}:m{WEBP_METHOD}"
+    return settings + f":px{MAX_PIXELS}" + (f":w{width}" if width else "")
+
+
+def _placeholder_settings():
+    return f"lqip:w{PLACEHOLDER_WIDTH}:q{PLACEHOLDER_QUALITY}:b{PLACEHOLDER_BLUR}"
+
+
+def placeholder_data_uri(im) -> str:
+    """A blurred PLACEHOLDER_WIDTH-wide WebP of im as a data: URI; "" for images with alpha."""
+    if im.mode == "RGBA":
+        # the placeholder would show through the transparent parts
+        return ""
+    height = max(1, round(im.height * PLACEHOLDER_WIDTH / im.width))
+    small = im.resize((PLACEHOLDER_WIDTH, height), Image.BILINEAR, reducing_gap=2.0)
+    small = small.filter(ImageFilter.GaussianBlur(PLACEHOLDER_BLUR))
+    buf = io.BytesIO()
+    small.save(buf, format="WEBP", quality=PLACEHOLDER_QUALITY, method=6)
+    return "data:image/webp;base64," + base64.b64encode(buf.getvalue()).decode("ascii")
+
+
+def probe_image_size(src_image: Path):
+    # reads the header only; pixels are decoded once, later, by the transcode job.
+    # This is the size the full-size output will have.
+    try:
+        with Image.open(src_image) as im:
+            return fit_pixels(im.size)
+    except Exception:
+        return None
+
+
+def video_attrs(video: Path, tag: str) -> str:
+    """preload="metadata" and, for MP4/MOV, width/height from the file, unless tag sets them."""
+    attrs = []
+    if not re.search(r'\spreload\s*=', tag, flags=re.I):
+        # fetch the duration and first frame, not the whole file
+        attrs.append(("preload", "metadata"))
+    if video.suffix.lower() in mp4_faststart.FASTSTART_EXTS:
         try:
-            date_obj = datetime.fromisoformat(date_str.replace('Z', '+00:00'))
-            lastmod = date_obj.strftime('%Y-%m-%d')
-        except Exception:
-            lastmod = current_date
-        
-        lines.append('  <url>')
-        lines.append(f'    <loc>{post_url}</loc>')
-        lines.append(f'    <lastmod>{lastmod}</lastmod>')
-        lines.append('    <changefreq>monthly</changefreq>')
-        lines.append('    <priority>0.8</priority>')
-        lines.append('  </url>')
-    
-    lines.append('</urlset>')
-    
-    # Write to file
-    with SITEMAP_FILE.open('w', encoding='utf-8') as f:
-        f.write('\n'.join(lines) + '\n')
-    
-    print(f"Sitemap updated with {published_count} published blog posts")
+            info = mp4_faststart.probe(video)
+        except (OSError, mp4_faststart.BoxError) as e:
+            print(f"Warning: cannot read video metadata of {video.name}: {e}")
+            info = {}
+        if "width" in info and not re.search(r'\s(?:width|height)\s*=', tag, flags=re.I):
+            attrs += [("width", info["width"]), ("height", info["height"])]
+        if "duration" in info:
+            print(f"Video {video.name}: {info.get('width', '?')}x{info.get('height', '?')}, {info['duration']:.1f}s")
+    return "".join(f' {k}="{v}"' for k, v in attrs)
+
+
+def media_url(path: str) -> str:
+    # a space or comma in a file name would split a srcset candidate
+    return quote(path, safe="/")
+
+
+def responsive_srcset(src: str, full_width: int, widths, ext: str = ".webp") -> str:
+    """srcset for an image at src ("images/x.webp", not yet URL-encoded) and its narrower variants."""
+    src_path = Path(src)
+    entries = [
+        media_url((src_path.parent / variant_path(src_path, width, ext).name).as_posix()) + f" {width}w"
+        for width in widths
+    ]
+    entries.append(media_url((src_path.parent / variant_path(src_path, None, ext).name).as_posix()) + f" {full_width}w")
+    return ", ".join(entries)
+
+
+def encode_variants(src_image: Path, targets, webp=None, placeholder: bool = False):
+    """
+    Decode src_image once and save every (dest, format, width) target from that
+    buffer. webp overrides the WebP options; adaptive_webp.SEARCH picks them for
+    this image first. Returns (the options picked by a search, else None; the
+    placeholder data: URI when asked for, else None).
+    """
+    with open_bounded(src_image) as im:
+        # convert to RGBA if image has alpha, otherwise RGB
+        if im.mode in ("RGBA", "LA"):
+            im = im.convert("RGBA")
+        else:
+            im = im.convert("RGB")
+        chosen = None
+        if webp == adaptive_webp.SEARCH:
+            webp = chosen = adaptive_webp.choose_webp_options(im)
+        _encode_targets(im, targets, webp)
+        return chosen, placeholder_data_uri(im) if placeholder else None
+
+
+def _encode_targets(im, targets, webp=None):
+    resized = {}
+    for dest, fmt, width in targets:
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        out = im
+        if width and width < im.width:
+            out = resized.get(width)
+            if out is None:
+                height = max(1, round(im.height * width / im.width))
+                out = resized[width] = im.resize((width, height), Image.LANCZOS)
+        _unlink_before_save(dest)
+        options = webp if fmt == "WEBP" and webp else _encoder_options(fmt)
+        out.save(dest, format=fmt, **options)
+
+
+def encode_webp(src_image: Path, dest_image: Path):
+    encode_variants(src_image, [(dest_image, "WEBP", None)])
 
 
 def convert_to_webp(src_image: Path, dest_image: Path):
-    dest_image.parent.mkdir(parents=True, exist_ok=True)
     try:
-        with Image.open(src_image) as im:
-            # convert to RGBA if image has alpha, otherwise RGB
-            if im.mode in ("RGBA", "LA"):
-                im = im.convert("RGBA")
-            else:
-                im = im.convert("RGB")
-            im.save(dest_image, format="WEBP", quality=85, method=6)
+        encode_webp(src_image, dest_image)
     except Exception as e:
         print(f"Failed to convert {src_image}: {e}")
 
 
-def process_item(src_item: Path, meta: dict):
-    html_path = find_html(src_item)
-    if not html_path:
-        print(f"No HTML found in {src_item}, skipping")
+def _init_image_worker(budget, max_pixels):
+    global DECODE_BUDGET, MAX_PIXELS
+    DECODE_BUDGET = budget
+    MAX_PIXELS = max_pixels
+
+
+def _transcode_job(src_image: str, targets, webp=None, placeholder: bool = False):
+    # runs in a worker process; errors are returned instead of raised so one
+    # broken file never takes the rest of the batch down with it. Returns
+    # (error, seconds spent encoding, peak RSS in KiB while encoding, WebP
+    # options found by an adaptive search, placeholder data: URI) so the
+    # parent can account for it.
+    _reset_peak_rss()
+    start = time.perf_counter()
+    error = None
+    chosen = placeholder_uri = None
+    try:
+        chosen, placeholder_uri = encode_variants(Path(src_image), targets, webp, placeholder)
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return error, time.perf_counter() - start, _peak_rss_kib(), chosen, placeholder_uri
+
+
+class TranscodeBatch:
+    """
+    The image conversions of one post. Each destination is encoded at most
+    once, together with its responsive variants; wait() blocks until every
+    submitted job finished and reports failures in submission order.
+    Batches of different posts can be in flight on the same TranscodePool
+    at the same time. Placeholders asked for with submit() are in
+    placeholders ({dest: data: URI, "" when the image has none}) after wait().
+    """
+
+    def __init__(self, pool):
+        self.pool = pool
+        self._pending = {}
+        self.placeholders = {}
+
+    def submit(self, src_image: Path, dest_image: Path, widths=(), avif: bool = False, placeholder: bool = False):
+        key = str(dest_image)
+        if key in self._pending:
+            return False
+        dest_image.parent.mkdir(parents=True, exist_ok=True)
+        targets = image_targets(dest_image, widths, avif and self.pool.avif)
+        self._pending[key] = (src_image,) + self.pool._start(src_image, targets, placeholder)
+        return True
+
+    def wait(self):
+        failures = []
+        for dest, (src, job, encoded, digest, cached_placeholder) in self._pending.items():
+            try:
+                error, seconds, peak_kib, chosen, placeholder_uri = job.result()
+            except Exception as e:
+                error, seconds, peak_kib, chosen, placeholder_uri = f"{type(e).__name__}: {e}", 0.0, None, None, None
+            if cached_placeholder is not None:
+                self.placeholders[dest] = cached_placeholder
+            elif placeholder_uri is not None:
+                self.placeholders[dest] = placeholder_uri
+            if encoded:
+                STATS.add_time("encode", seconds)
+                STATS.add_image({"src": str(src), "seconds": round(seconds, 4), "peakRssKiB": peak_kib})
+            if error:
+                print(f"Failed to convert {src}: {error}")
+                failures.append({"src": str(src), "dest": dest, "error": error})
+                STATS.count("images_failed")
+                continue
+            if encoded:
+                STATS.count("images_encoded")
+                STATS.count("variants_encoded", len(encoded))
+                STATS.count("bytes_in", _file_size(Path(src)))
+                STATS.count("bytes_out", sum(_file_size(Path(d)) for d, _fmt, _w in encoded))
+            if chosen and digest:
+                self.pool.adaptive.put(digest, chosen)
+                STATS.count("webp_searched")
+                if chosen.get("lossless"):
+                    STATS.count("webp_lossless")
+        self._pending = {}
+        return failures
+
+
+class TranscodePool:
+    """
+    Runs image conversions on a process pool (inline when jobs is 1), serving
+    hits from the transcode cache. submit()/wait() use a default batch; use
+    batch() for one batch per post when several posts run concurrently.
+    """
+
+    def __init__(
+        self, jobs: int = 1, cache: TranscodeCache = None, avif: bool = False,
+        adaptive: adaptive_webp.SettingsRecord = None,
+    ):
+        self.jobs = max(1, int(jobs or 1))
+        self.cache = cache
+        self.avif = avif and AVIF_SUPPORTED
+        # with a settings record, WebP options are searched per image (or taken from it)
+        self.adaptive = adaptive
+        self._executor = None
+        if self.jobs > 1:
+            # workers are started while item threads run; forking then can copy a
+            # lock some other thread holds into the child, so spawn them instead
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.jobs, mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_image_worker, initargs=(DECODE_BUDGET, MAX_PIXELS),
+            )
+        self._default_batch = TranscodeBatch(self)
+
+    def _start(self, src_image: Path, targets, placeholder: bool = False):
+        # returns (future, targets to encode, source digest when the job searches
+        # WebP options, cached placeholder); targets already in the cache are
+        # placed now and left out of the job, the others are stored once it
+        # succeeds. A placeholder that is not cached is made by the job.
+        missing = []
+        to_store = []
+        adaptive = self.adaptive is not None
+        for dest, fmt, width in targets:
+            cache_key = self.cache.key(src_image, _cache_settings(fmt, width, adaptive)) if self.cache else None
+            if cache_key and self.cache.fetch(cache_key, dest.suffix, dest):
+                continue
+            missing.append((str(dest), fmt, width))
+            if cache_key:
+                to_store.append((cache_key, dest))
+        webp = None
+        digest = None
+        if adaptive and any(fmt == "WEBP" for _dest, fmt, _width in missing):
+            digest = self.cache.source_digest(Path(src_image)) if self.cache else file_sha256(Path(src_image))
+            webp = self.adaptive.get(digest)
+            if webp is None:
+                webp = adaptive_webp.SEARCH
+            else:
+                digest = None
+        cached_placeholder = None
+        placeholder_key = None
+        if placeholder and self.cache:
+            placeholder_key = self.cache.key(src_image, _placeholder_settings())
+            data = self.cache.fetch_bytes(placeholder_key, ".lqip") if placeholder_key else None
+            if data is not None:
+                cached_placeholder = data.decode("ascii")
+                placeholder = False
+        if not missing and not placeholder:
+            job = Future()
+            job.set_result((None, 0.0, None, None, None))
+        elif self._executor is None:
+            job = Future()
+            job.set_result(_transcode_job(str(src_image), missing, webp, placeholder))
+        else:
+            job = self._executor.submit(_transcode_job, str(src_image), missing, webp, placeholder)
+        if to_store or (placeholder and placeholder_key):
+            job.add_done_callback(partial(self._store_finished, to_store, placeholder_key if placeholder else None))
+        return job, missing, digest, cached_placeholder
+
+    def _store_finished(self, to_store, placeholder_key, job):
+        # stored as soon as the job is done, so encodes finished before an
+        # interrupted run are cache hits when the item is resumed
+        if job.cancelled() or job.exception() is not None or job.result()[0]:
+            return
+        for cache_key, produced in to_store:
+            self.cache.store(cache_key, produced.suffix, produced)
+        if placeholder_key and job.result()[4] is not None:
+            self.cache.store_bytes(placeholder_key, ".lqip", job.result()[4].encode("ascii"))
+
+    def batch(self):
+        return TranscodeBatch(self)
+
+    def submit(self, src_image: Path, dest_image: Path, widths=(), avif: bool = False):
+        return self._default_batch.submit(src_image, dest_image, widths, avif)
+
+    def wait(self):
+        return self._default_batch.wait()
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
         return False
 
-    with html_path.open("r", encoding="utf-8") as f:
-        html = f.read()
 
-    title = extract_text(html, TITLE_RE) or html_path.stem
-    description = extract_text(html, META_DESC_RE) or ''
-    first_p = extract_text(html, P_TAG_RE) or ''
+class MediaIndex:
+    """
+    Index of the files in every data/ directory below a raw item, built with a
+    single directory walk. Stems map to their files ranked by MEDIA_EXTS
+    priority (then depth and path); stems present with several media
+    extensions are collected in `ambiguous`.
+    """
+
+    def __init__(self, src_item: Path):
+        self.files = []
+        self.by_stem = {}
+        self.ambiguous = []
+        if not src_item.is_dir():
+            return
+        for dirpath, dirnames, filenames in os.walk(src_item):
+            dirnames.sort()
+            if Path(dirpath) == src_item or os.path.basename(dirpath) != "data":
+                continue
+            for name in sorted(filenames):
+                self.files.append(Path(dirpath) / name)
+
+        rank = {ext: i for i, ext in enumerate(MEDIA_EXTS)}
+        for path in self.files:
+            if path.suffix.lower() in rank:
+                self.by_stem.setdefault(path.stem, []).append(path)
+        for stem, paths in self.by_stem.items():
+            paths.sort(key=lambda p: (rank[p.suffix.lower()], len(p.parts), str(p)))
+            if len({p.suffix.lower() for p in paths}) > 1:
+                self.ambiguous.append({
+                    "stem": stem,
+                    "chosen": paths[0].relative_to(src_item).as_posix(),
+                    "others": [p.relative_to(src_item).as_posix() for p in paths[1:]],
+                })
+
+    def lookup(self, stem: str):
+        paths = self.by_stem.get(stem)
+        return paths[0] if paths else None
+
+
+def item_signature(src_item: Path) -> str:
+    """Fingerprint of a raw item from the path, size and mtime of its files (no reads)."""
+    files = [src_item] if src_item.is_file() else sorted(p for p in src_item.rglob("*") if p.is_file())
+    entries = []
+    for path in files:
+        st = path.stat()
+        entries.append(f"{path.relative_to(src_item.parent).as_posix()}|{st.st_size}|{st.st_mtime_ns}")
+    return hashlib.sha1("\n".join(entries).encode("utf-8")).hexdigest()
+
+
+class ItemPlan:
+    """
+    A raw item scheduled for processing; run_item_stages() walks ITEM_STAGES
+    for it. The post is built in a staging directory (post_dir) named after
+    the raw item, with PENDING_ID where its id goes: ids are handed out in
+    journal order as posts are recorded, so an item that fails never takes
+    one. The publish stage fills the id in and renames post_dir to
+    final_dir. After each stage the plan is written to state_file, from
+    which a later run resumes it.
+    """
+
+    def __init__(self, src_item: Path, html_path: Path, signature: str = None, key: str = None):
+        key = key or src_item.name
+        self.src_item = src_item
+        self.html_path = html_path
+        self.post_id = None
+        self.post_dir = STAGING_DIR / key
+        self.state_file = STAGING_DIR / f"{key}.json"
+        self.signature = signature or item_signature(src_item)
+        self.dest_html_name = html_path.with_suffix(".html").name
+        self.completed = []
+        # filled in by the stages
+        self.doc = None
+        self.fields = None
+        self.first_image_src = None
+        self.post_meta = None
+
+    @property
+    def final_dir(self):
+        return BLOG_DIR / str(self.post_id)
+
+    def assign_id(self, post_id: int):
+        self.post_id = post_id
+        meta = dict(self.post_meta, id=post_id, path=fill_post_id(self.post_meta["path"], post_id))
+        meta["slug"] = meta.get("slug") or str(post_id)
+        self.post_meta = meta
+
+    def checkpoint(self):
+        state = {
+            "src": self.src_item.name,
+            "signature": self.signature,
+            "postId": self.post_id,
+            "completed": self.completed,
+            "fields": self.fields,
+            "firstImageSrc": self.first_image_src,
+            "postMeta": self.post_meta,
+            # the document with every rewrite so far; parsed again on resume
+            "html": self.doc.render() if self.doc is not None else None,
+        }
+        atomic_write_bytes(self.state_file, dump_json(state))
+
+    def resume(self, state: dict):
+        self.completed = list(state.get("completed") or [])
+        self.post_id = state.get("postId")
+        self.fields = state.get("fields")
+        self.first_image_src = state.get("firstImageSrc")
+        self.post_meta = state.get("postMeta")
+        if state.get("html") is not None:
+            self.doc = PostDocument(state["html"])
+
+    def clear_state(self):
+        if self.state_file.exists():
+            self.state_file.unlink()
+
+
+def fill_post_id(text: str, post_id: int) -> str:
+    return text.replace(f"/BlogData/{PENDING_ID}/", f"/BlogData/{post_id}/")
+
+
+def load_staged_states():
+    """[(state file, state)] of the items an interrupted run left in STAGING_DIR."""
+    states = []
+    if not STAGING_DIR.exists():
+        return states
+    for path in sorted(STAGING_DIR.glob("*.json")):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            print(f"Warning: ignoring unreadable staging state {path}")
+            continue
+        if state.get("src"):
+            states.append((path, state))
+    return states
+
+
+def discard_staged(state_file: Path, state: dict, known_ids):
+    """Drop an unfinished item's staging directory and state."""
+    post_id = state.get("postId")
+    completed = state.get("completed") or []
+    # published but never recorded: the directory belongs to no post
+    if "publish" in completed and "record" not in completed and post_id is not None and post_id not in known_ids:
+        shutil.rmtree(BLOG_DIR / str(post_id), ignore_errors=True)
+    shutil.rmtree(state_file.with_suffix(""), ignore_errors=True)
+    if state_file.exists():
+        state_file.unlink()
+
+
+def plan_items(candidates, meta: dict):
+    """
+    Planning phase: find each candidate's HTML, in sorted order. Ids are
+    assigned later, as posts are recorded. An item left unfinished by an
+    interrupted run resumes after its last completed stage, unless its files
+    changed since.
+    """
+    known_ids = {p.get("id") for p in meta.get("posts", [])}
+    last_id = meta.get("lastId") or 0
+    staged = {}
+    for state_file, state in load_staged_states():
+        completed = state.get("completed") or []
+        post_id = state.get("postId")
+        if "record" in completed and post_id not in known_ids:
+            # the journal record did not survive; record the post again
+            completed.remove("record")
+        if "publish" in completed:
+            # published under an id some other post has taken since
+            usable = "record" in completed or (
+                isinstance(post_id, int) and post_id > last_id and (BLOG_DIR / str(post_id)).is_dir()
+            )
+        else:
+            # an id before publish means the HTML was written with it, by an older version
+            usable = post_id is None
+        if usable:
+            staged[state["src"]] = (state_file, state)
+        else:
+            discard_staged(state_file, state, known_ids)
+
+    plans = []
+    for src_item in sorted(candidates):
+        html_path = find_html(src_item)
+        if not html_path:
+            print(f"No HTML found in {src_item}, skipping")
+            continue
+        signature = item_signature(src_item)
+        state_file, state = staged.pop(src_item.name, (None, None))
+        if state is None or state.get("signature") != signature:
+            if state is not None:
+                discard_staged(state_file, state, known_ids)
+            plans.append(ItemPlan(src_item, html_path, signature))
+            continue
+        plan = ItemPlan(src_item, html_path, signature, key=state_file.stem)
+        plan.resume(state)
+        print(f"Resuming {src_item.name} after: {', '.join(plan.completed) or 'nothing'}")
+        plans.append(plan)
+    # states of items gone from RawData
+    for state_file, state in staged.values():
+        discard_staged(state_file, state, known_ids)
+    return plans
+
+
+def _stage_parse(plan: ItemPlan, pool, placer):
+    html_path = plan.html_path
+    if html_path.suffix.lower() == POST_SOURCE_EXT:
+        html = POST_RENDERER.render_source(html_path)
+    else:
+        with html_path.open("r", encoding="utf-8") as f:
+            html = f.read()
+
+    # tokenize once; field extraction and every rewrite below work off this document
+    doc = PostDocument(html)
+    title = doc.title() or html_path.stem
+    description = doc.first_group(META_DESC_RE) or ''
+    first_p = doc.first_paragraph() or ''
     # strip simple HTML tags from first paragraph for fallback summary
     def _strip_tags(s: str) -> str:
         return re.sub(r'<[^>]+>', '', s or '').strip()
@@ -334,7 +1518,7 @@ def process_item(src_item: Path, meta: dict):
 
     # extract tags from meta tags like <meta name="tags" content="0/1/3"> or "1,2" or whitespace-separated
     tags = []
-    for tag_content in META_TAGS_RE.findall(html):
+    for tag_content in doc.tag_contents(META_TAGS_RE):
         if not tag_content:
             continue
         # split on slash, comma, or whitespace
@@ -348,24 +1532,39 @@ def process_item(src_item: Path, meta: dict):
             if iv not in tags:
                 tags.append(iv)
 
-    next_id = (meta.get("lastId") or 0) + 1
-    post_dir = BLOG_DIR / str(next_id)
-    post_dir.mkdir(parents=True, exist_ok=True)
+    plan.doc = doc
+    plan.fields = {"title": title, "summary": summary, "tags": tags}
+
 
-    # Define destination HTML name early for use in blog_url
-    dest_html_name = html_path.name
+def _stage_transcode(plan: ItemPlan, pool, placer):
+    src_item = plan.src_item
+    html_path = plan.html_path
+    post_dir = plan.post_dir
+    doc = plan.doc
+    batch = pool.batch()
+    post_dir.mkdir(parents=True, exist_ok=True)
 
     images_dir = post_dir / "images"
     images_dir.mkdir(parents=True, exist_ok=True)
 
-    # prepare media extension groups
-    image_exts = ('.png', '.jpg', '.jpeg', '.gif', '.svg', '.bmp', '.webp')
-    video_exts = ('.mp4', '.mov', '.m4v', '.webm', '.ogv')
-    audio_exts = ('.mp3', '.wav', '.aac', '.ogg', '.flac', '.m4a')
+    # one directory walk serves every src lookup and the data/ sweep below
+    with STATS.timer("scan"):
+        media_index = MediaIndex(src_item)
+    STATS.count("files_scanned", len(media_index.files))
+    for warning in media_index.ambiguous:
+        print(
+            f"Warning: ambiguous media stem '{warning['stem']}' in {src_item}: "
+            f"using {warning['chosen']} over {', '.join(warning['others'])}"
+        )
     first_image_src = None
+    images_seen = 0
+    # <img> tags that get a placeholder background once their image is encoded
+    placeholder_tags = []
+    # an author's own <picture> markup is left alone rather than nested
+    wrap_avif = pool.avif and not doc.has_tag("picture")
 
     # replace src attributes precisely using a callback so only the attribute value is changed
-    def _replace_src(match):
+    def _replace_src(match, tag):
         original = match.group(0)
         src = match.group(1)
         # ignore absolute urls
@@ -376,21 +1575,8 @@ def process_item(src_item: Path, meta: dict):
         src_filename_stem = Path(src).stem
         
         # Search for actual file in data/data directories using filename stem
-        src_path = None
-        actual_ext = None
-        
-        # Look in nested data directories
-        if src_item.is_dir():
-            for data_dir in src_item.rglob("data"):
-                # Try all possible media extensions
-                for ext in image_exts + video_exts + audio_exts:
-                    candidate = data_dir / f"{src_filename_stem}{ext}"
-                    if candidate.exists():
-                        src_path = candidate
-                        actual_ext = ext
-                        break
-                if src_path:
-                    break
+        src_path = media_index.lookup(src_filename_stem)
+        actual_ext = src_path.suffix.lower() if src_path else None
         
         # Fallback: try original path resolution
         if not src_path:
@@ -410,136 +1596,252 @@ def process_item(src_item: Path, meta: dict):
         ext = actual_ext if actual_ext else src_path.suffix.lower()
         
         # images: convert to webp
-        if ext in image_exts:
+        if ext in IMAGE_EXTS:
             dest_name = Path(src).stem + ".webp"
             dest_img_path = images_dir / dest_name
-            convert_to_webp(src_path, dest_img_path)
-            new_src = f"images/{dest_name}"
+            rel_src = f"images/{dest_name}"
+            new_src = media_url(rel_src)
             nonlocal first_image_src
             if first_image_src is None:
                 first_image_src = new_src
-            return original.replace(src, new_src, 1)
+            size = probe_image_size(src_path) if original[:4].lower() == "<img" else None
+            if not size:
+                batch.submit(src_path, dest_img_path)
+                return original.replace(src, new_src, 1)
+            # match.string is the whole tag, so a srcset or size the author set is kept
+            full_tag = match.string
+            responsive = not re.search(r'\ssrcset\s*=', full_tag, flags=re.I)
+            widths = [w for w in VARIANT_WIDTHS if w < size[0]] if responsive else []
+            avif = wrap_avif and responsive
+            # an author's inline style is not merged with the placeholder background
+            placeholder = not re.search(r'\sstyle\s*=', full_tag, flags=re.I)
+            batch.submit(src_path, dest_img_path, widths, avif=avif, placeholder=placeholder)
+            if placeholder:
+                placeholder_tags.append((tag, str(dest_img_path)))
+            attrs = []
+            if widths:
+                attrs.append(("srcset", responsive_srcset(rel_src, size[0], widths)))
+                attrs.append(("sizes", IMAGE_SIZES))
+            if avif:
+                source = (
+                    f'<picture><source type="image/avif" '
+                    f'srcset="{responsive_srcset(rel_src, size[0], widths, ".avif")}"'
+                    + (f' sizes="{IMAGE_SIZES}"' if widths else "") + ">"
+                )
+                doc.wrap_tag(tag, source, "</picture>")
+            if not re.search(r'\s(?:width|height)\s*=', full_tag, flags=re.I):
+                attrs += [("width", size[0]), ("height", size[1])]
+            nonlocal images_seen
+            images_seen += 1
+            # the first images are likely above the fold; lazy loading would only delay them
+            if images_seen > EAGER_IMAGES and not re.search(r'\sloading\s*=', full_tag, flags=re.I):
+                attrs.append(("loading", "lazy"))
+            if not re.search(r'\sdecoding\s*=', full_tag, flags=re.I):
+                attrs.append(("decoding", "async"))
+            return original.replace(src, new_src, 1) + "".join(f' {k}="{v}"' for k, v in attrs)
 
         # videos: copy into videos/
-        if ext in video_exts:
+        if ext in VIDEO_EXTS:
             videos_dir = post_dir / "videos"
             videos_dir.mkdir(parents=True, exist_ok=True)
             dest_name = Path(src).name
             dest_video = videos_dir / dest_name
             try:
-                shutil.copy2(src_path, dest_video)
+                placer.place_video(src_path, dest_video)
             except Exception as e:
                 print(f"Failed to copy video {src_path}: {e}")
                 return original
-            new_src = f"videos/{dest_name}"
-            return original.replace(src, new_src, 1)
+            new_src = media_url(f"videos/{dest_name}")
+            if original[:6].lower() != "<video":
+                # a <source> inside <video>: size and preload belong on the parent
+                return original.replace(src, new_src, 1)
+            return original.replace(src, new_src, 1) + video_attrs(dest_video, match.string)
 
         # audio: copy into audio/
-        if ext in audio_exts:
+        if ext in AUDIO_EXTS:
             audio_dir = post_dir / "audio"
             audio_dir.mkdir(parents=True, exist_ok=True)
             dest_name = Path(src).name
             dest_audio = audio_dir / dest_name
             try:
-                shutil.copy2(src_path, dest_audio)
+                placer.place(src_path, dest_audio)
             except Exception as e:
                 print(f"Failed to copy audio {src_path}: {e}")
                 return original
-            new_src = f"audio/{dest_name}"
+            new_src = media_url(f"audio/{dest_name}")
             return original.replace(src, new_src, 1)
 
         # unknown ext: leave as-is
         return original
 
-    replaced = MEDIA_RE.sub(_replace_src, html)
+    with STATS.timer("rewrite_media"):
+        doc.rewrite_media(_replace_src)
+
+    # Process files in data directories
+    for item in media_index.files:
+        ext = item.suffix.lower()
+        
+        # Process images: convert to webp
+        if ext in IMAGE_EXTS:
+            dest_name = item.stem + ".webp"
+            dest_img_path = images_dir / dest_name
+            if batch.submit(item, dest_img_path):
+                print(f"Queued data image: {item.name} -> {dest_name}")
+        
+        # Process videos: copy to videos/
+        elif ext in VIDEO_EXTS:
+            videos_dir = post_dir / "videos"
+            videos_dir.mkdir(parents=True, exist_ok=True)
+            dest_video = videos_dir / item.name
+            try:
+                if placer.place_video(item, dest_video) != "dedupe":
+                    print(f"Copied data video: {item.name}")
+            except Exception as e:
+                print(f"Failed to copy data video {item}: {e}")
+        
+        # Process audio: copy to audio/
+        elif ext in AUDIO_EXTS:
+            audio_dir = post_dir / "audio"
+            audio_dir.mkdir(parents=True, exist_ok=True)
+            dest_audio = audio_dir / item.name
+            try:
+                if placer.place(item, dest_audio) != "dedupe":
+                    print(f"Copied data audio: {item.name}")
+            except Exception as e:
+                print(f"Failed to copy data audio {item}: {e}")
+
+    # every image (from src rewriting and the data/ sweep) has to be on disk before the
+    # social card is cut from the first one and the HTML is written
+    with STATS.timer("transcode_wait"):
+        batch.wait()
+
+    for tag, dest in placeholder_tags:
+        uri = batch.placeholders.get(dest)
+        if uri:
+            doc.add_attrs(tag, f' style="background:url({uri}) center/cover no-repeat"')
+            STATS.count("placeholders")
+
+    plan.first_image_src = first_image_src
+
+
+def _stage_write(plan: ItemPlan, pool, placer):
+    src_item = plan.src_item
+    post_dir = plan.post_dir
+    dest_html_name = plan.dest_html_name
+    doc = plan.doc
+    first_image_src = plan.first_image_src
+    title = plan.fields["title"]
+    summary = plan.fields["summary"]
+    tags = plan.fields["tags"]
 
     # Prefer the first converted image for card preview when available
     if first_image_src:
-        if META_OG_IMAGE_RE.search(replaced):
-            replaced = META_OG_IMAGE_RE.sub(
-                f'<meta property="og:image" content="{first_image_src}">',
-                replaced,
-            )
-        if META_TWITTER_IMAGE_RE.search(replaced):
-            replaced = META_TWITTER_IMAGE_RE.sub(
-                f'<meta name="twitter:image" content="{first_image_src}">',
-                replaced,
-            )
+        doc.sub_tags(META_OG_IMAGE_RE, lambda _m: f'<meta property="og:image" content="{first_image_src}">')
+        doc.sub_tags(META_TWITTER_IMAGE_RE, lambda _m: f'<meta name="twitter:image" content="{first_image_src}">')
 
-    blog_url = normalize_public_url(f"{BASE_URL}data/BlogData/{next_id}/{dest_html_name}")
-    replaced = normalize_social_meta(replaced, blog_url, post_dir / dest_html_name)
+    blog_url = normalize_public_url(f"{SITE_URL}data/BlogData/{PENDING_ID}/{dest_html_name}")
+    doc.normalize_social_meta(blog_url, post_dir / dest_html_name)
+    replaced = doc.render()
+    if ASSET_STORE is not None:
+        replaced = ASSET_STORE.adopt(post_dir, replaced)
+    if MINIFY_HTML:
+        replaced = minify_html(replaced)
 
     # write HTML using original source filename
     with (post_dir / dest_html_name).open("w", encoding="utf-8") as f:
         f.write(replaced)
 
-    # Process files in data directories
-    if src_item.is_dir():
-        for data_dir in src_item.rglob("data"):
-            if data_dir.is_dir():
-                for item in data_dir.iterdir():
-                    if not item.is_file():
-                        continue
-                    
-                    ext = item.suffix.lower()
-                    
-                    # Process images: convert to webp
-                    if ext in image_exts:
-                        dest_name = item.stem + ".webp"
-                        dest_img_path = images_dir / dest_name
-                        convert_to_webp(item, dest_img_path)
-                        print(f"Converted data image: {item.name} -> {dest_name}")
-                    
-                    # Process videos: copy to videos/
-                    elif ext in video_exts:
-                        videos_dir = post_dir / "videos"
-                        videos_dir.mkdir(parents=True, exist_ok=True)
-                        dest_video = videos_dir / item.name
-                        try:
-                            shutil.copy2(item, dest_video)
-                            print(f"Copied data video: {item.name}")
-                        except Exception as e:
-                            print(f"Failed to copy data video {item}: {e}")
-                    
-                    # Process audio: copy to audio/
-                    elif ext in audio_exts:
-                        audio_dir = post_dir / "audio"
-                        audio_dir.mkdir(parents=True, exist_ok=True)
-                        dest_audio = audio_dir / item.name
-                        try:
-                            shutil.copy2(item, dest_audio)
-                            print(f"Copied data audio: {item.name}")
-                        except Exception as e:
-                            print(f"Failed to copy data audio {item}: {e}")
-
     # copy other files (non-html assets) that are in the src_item folder (like css) if present
     for item in src_item.iterdir() if src_item.is_dir() else []:
-        if item.is_file() and item.suffix.lower() != ".html":
+        if item.is_file() and item.suffix.lower() not in (".html", POST_SOURCE_EXT):
             # skip images, videos, and audio handled above
-            if item.name.lower().endswith(image_exts + video_exts + audio_exts):
+            if item.name.lower().endswith(MEDIA_EXTS):
                 continue
             try:
-                shutil.copy2(item, post_dir / item.name)
+                placer.place(item, post_dir / item.name)
             except Exception as e:
                 print(f"Failed to copy asset {item}: {e}")
 
     post_meta = {
-        "id": next_id,
+        # id (and the slug fallback) are filled in by ItemPlan.assign_id()
+        "id": None,
         "title": title,
         "summary": summary,
-        "slug": make_slug(title) or str(next_id),
+        "slug": make_slug(title),
         "date": datetime.utcnow().isoformat() + "Z",
-        "path": f"data/BlogData/{next_id}/{dest_html_name}",
+        "path": f"data/BlogData/{PENDING_ID}/{dest_html_name}",
         "tags": tags,
         "published": True
     }
 
-    meta.setdefault("posts", []).append(post_meta)
-    meta["lastId"] = next_id
+    plan.post_meta = post_meta
+
+
+def _fsync_dir(path):
+    # new and renamed entries are only durable once their directory is synced;
+    # directories cannot be opened for that on Windows
+    try:
+        fd = os.open(str(path), os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def fsync_tree(root: Path):
+    for dirpath, _dirnames, filenames in os.walk(root):
+        for name in filenames:
+            fd = os.open(os.path.join(dirpath, name), os.O_RDONLY)
+            try:
+                os.fsync(fd)
+            finally:
+                os.close(fd)
+        _fsync_dir(dirpath)
+
+
+def replace_dir(staged: Path, dest: Path):
+    """Move the directory staged to dest, replacing whatever dest holds."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    old = dest.with_name(f".{dest.name}.old")
+    if dest.exists():
+        # a directory of no post, left by an interrupted run
+        shutil.rmtree(old, ignore_errors=True)
+        os.replace(dest, old)
+    try:
+        os.replace(staged, dest)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        # staging is on another filesystem; not atomic, but still all or nothing per run
+        shutil.move(str(staged), str(dest))
+    _fsync_dir(dest.parent)
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def fill_html_post_id(html_file: Path, post_id: int):
+    data = html_file.read_bytes()
+    filled = fill_post_id(data.decode("utf-8"), post_id).encode("utf-8")
+    if filled != data:
+        html_file.write_bytes(filled)
+
 
+def _stage_publish(plan: ItemPlan, pool, placer):
+    # the post is complete in staging: give it its id, make it durable, then swap it in whole
+    plan.post_dir.mkdir(parents=True, exist_ok=True)
+    fill_html_post_id(plan.post_dir / plan.dest_html_name, plan.post_id)
+    fsync_tree(plan.post_dir)
+    replace_dir(plan.post_dir, plan.final_dir)
+
+
+def _stage_archive(plan: ItemPlan, pool, placer):
+    src_item = plan.src_item
     # move processed raw to archive
     ARCHIVE_DIR.mkdir(parents=True, exist_ok=True)
-    dest_archive = ARCHIVE_DIR / (src_item.name + f".processed.{next_id}")
+    dest_archive = ARCHIVE_DIR / (src_item.name + f".processed.{plan.post_id}")
     try:
         if src_item.is_dir():
             shutil.move(str(src_item), str(dest_archive))
@@ -551,37 +1853,387 @@ def process_item(src_item: Path, meta: dict):
     except Exception as e:
         print(f"Warning: failed to move processed item {src_item}: {e}")
 
-    print(f"Processed {src_item} -> id={next_id}")
-    return True
 
+ITEM_STAGES = (
+    ("parse", _stage_parse),
+    ("transcode", _stage_transcode),
+    ("write", _stage_write),
+    ("publish", _stage_publish),
+    ("archive", _stage_archive),
+)
+
+
+def run_item_stages(plan: ItemPlan, pool, placer, until: str = None):
+    for name, stage in ITEM_STAGES:
+        if name == until:
+            return
+        if name in plan.completed:
+            continue
+        with STATS.timer(f"stage.{name}"):
+            stage(plan, pool, placer)
+        plan.completed.append(name)
+        plan.checkpoint()
+
+
+def rollback_item(plan: ItemPlan):
+    # the raw item stays in RawData and is planned again by the next run; an
+    # unrecorded post leaves lastId alone, so its id goes to the next post
+    if "publish" in plan.completed and "record" not in plan.completed:
+        # published but never recorded: the directory belongs to no post
+        shutil.rmtree(plan.final_dir, ignore_errors=True)
+    if plan.post_dir.exists():
+        shutil.rmtree(plan.post_dir, ignore_errors=True)
+    plan.clear_state()
+
+
+def execute_plans(plans, meta: dict, pool, placer, workers: int = 1, profiler: ItemProfiler = None):
+    """
+    Execution phase: run each plan's stages, several items at a time. Once an
+    item is built, it takes the next id, is published and recorded in the
+    journal in one step under a lock, then archived. A failing item is
+    rolled back alone and takes no id. Returns the ids that were processed.
+    With a profiler, items run one at a time, each profiled on its own.
+    """
+    store = post_store()
+    record_lock = threading.Lock()
+
+    def _run(plan):
+        if profiler is not None:
+            with profiler.profile(plan.src_item.name):
+                return _run_stages(plan)
+        return _run_stages(plan)
+
+    def _record(plan):
+        with record_lock:
+            if "publish" not in plan.completed:
+                plan.assign_id((meta.get("lastId") or 0) + 1)
+                with STATS.timer("stage.publish"):
+                    _stage_publish(plan, pool, placer)
+                plan.completed.append("publish")
+                plan.checkpoint()
+            store.append(meta, plan.post_meta)
+        plan.completed.append("record")
+        plan.checkpoint()
+
+    def _run_stages(plan):
+        try:
+            run_item_stages(plan, pool, placer, until="publish")
+            if "record" not in plan.completed:
+                _record(plan)
+        except Exception as e:
+            print(f"Error: failed to process {plan.src_item}: {e}")
+            rollback_item(plan)
+            return None
+        run_item_stages(plan, pool, placer)
+        plan.clear_state()
+        print(f"Processed {plan.src_item} -> id={plan.post_id}")
+        STATS.count("items_processed")
+        return plan.post_id
+
+    # posts an interrupted run published but did not record hold the next ids already
+    held = sorted((p for p in plans if "publish" in p.completed and "record" not in p.completed), key=lambda p: p.post_id)
+    results = [_run(plan) for plan in held]
+    plans = [plan for plan in plans if plan not in held]
+    workers = 1 if profiler is not None else max(1, min(int(workers or 1), len(plans) or 1))
+    if workers == 1:
+        results += [_run(plan) for plan in plans]
+    else:
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results += list(executor.map(_run, plans))
+    return [post_id for post_id in results if post_id is not None]
+
+
+def process_item(src_item: Path, meta: dict, pool: TranscodePool = None, placer: MediaPlacer = None):
+    if placer is None:
+        placer = MediaPlacer()
+    if pool is None:
+        with TranscodePool() as local_pool:
+            return process_item(src_item, meta, local_pool, placer)
+    plans = plan_items([src_item], meta)
+    return bool(execute_plans(plans, meta, pool, placer))
+
+
+def build_preview(src_item: Path, post_id: int, pool, placer):
+    """
+    Build a raw item into PREVIEW_DIR/<item name>/ the way a run would, but
+    leave it in RawData and out of posts.json. Returns the preview HTML path.
+    """
+    html_path = find_html(src_item)
+    if not html_path:
+        print(f"No HTML found in {src_item}, skipping")
+        return None
+    plan = ItemPlan(src_item, html_path, signature="preview")
+    plan.post_dir = PREVIEW_DIR / f".{src_item.name}.build"
+    shutil.rmtree(plan.post_dir, ignore_errors=True)
+    for name, stage in ITEM_STAGES:
+        if name == "publish":
+            break
+        with STATS.timer(f"stage.{name}"):
+            stage(plan, pool, placer)
+    fill_html_post_id(plan.post_dir / plan.dest_html_name, post_id)
+    dest = PREVIEW_DIR / src_item.name
+    # swapped in whole, so the server never hands out a half-built page
+    replace_dir(plan.post_dir, dest)
+    return dest / plan.dest_html_name
+
+
+def _watched_items(changed):
+    """Raw items to rebuild for a set of changed paths; a template change rebuilds every .post item."""
+    items = set()
+    templates = False
+    for path in changed:
+        if TEMPLATE_DIR in path.parents:
+            templates = True
+        elif RAW_DIR in path.parents:
+            items.add(RAW_DIR / path.relative_to(RAW_DIR).parts[0])
+    if templates and RAW_DIR.exists():
+        for src_item in RAW_DIR.iterdir():
+            html_path = find_html(src_item) if src_item != ARCHIVE_DIR else None
+            if html_path and html_path.suffix.lower() == POST_SOURCE_EXT:
+                items.add(src_item)
+    return items
+
+
+def watch(args):
+    """
+    Serve the site locally and keep a preview of every raw item up to date:
+    each change under RawData/ or HTMLTemplates/ rebuilds only the items it
+    touches, with unchanged images served from the transcode cache.
+    """
+    RAW_DIR.mkdir(parents=True, exist_ok=True)
+    PREVIEW_DIR.mkdir(parents=True, exist_ok=True)
+    server = DevServer(
+        ROOT, args.port, mounts={"/preview/": PREVIEW_DIR}, site_url=SITE_URL,
+        immutable=("/data/BlogData/assets/",),
+    )
+    server.start()
+    print(f"Serving {ROOT} at {server.url()}, previews of RawData under {server.url('preview/')}")
+    poller = Poller([RAW_DIR, TEMPLATE_DIR], ignore=[ARCHIVE_DIR])
+    pending = {p for p in RAW_DIR.iterdir() if p != ARCHIVE_DIR}
+    placer = MediaPlacer()
+    adaptive = adaptive_webp.SettingsRecord(WEBP_SETTINGS_FILE) if args.adaptive_webp else None
+    try:
+        with TranscodePool(args.jobs, TRANSCODE_CACHE, avif=not args.no_avif, adaptive=adaptive) as pool:
+            while True:
+                # previews get the ids a one-worker run would give them now
+                last_id = load_meta().get("lastId") or 0
+                ids = {p: last_id + n for n, p in enumerate(sorted(p for p in RAW_DIR.iterdir() if p != ARCHIVE_DIR), 1)}
+                for src_item in sorted(pending):
+                    if src_item not in ids:
+                        shutil.rmtree(PREVIEW_DIR / src_item.name, ignore_errors=True)
+                        print(f"Removed preview of {src_item.name}")
+                        continue
+                    start = time.perf_counter()
+                    try:
+                        page = build_preview(src_item, ids[src_item], pool, placer)
+                    except Exception as e:
+                        print(f"Error: failed to build a preview of {src_item}: {e}")
+                        continue
+                    if page:
+                        elapsed = time.perf_counter() - start
+                        rel = page.relative_to(PREVIEW_DIR).as_posix()
+                        print(f"Built {src_item.name} in {elapsed:.2f}s: {server.url('preview/' + rel)}")
+                if adaptive is not None:
+                    adaptive.save()
+                pending = set()
+                print(f"Watching {RAW_DIR.relative_to(ROOT)} and {TEMPLATE_DIR.relative_to(ROOT)} (Ctrl+C to stop)")
+                while not pending:
+                    time.sleep(WATCH_INTERVAL)
+                    changed = poller.poll()
+                    # editors save in several steps; wait until the tree is quiet
+                    while changed:
+                        pending |= _watched_items(changed)
+                        time.sleep(WATCH_INTERVAL)
+                        changed = poller.poll()
+    except KeyboardInterrupt:
+        print("Stopped.")
+    finally:
+        server.stop()
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Process raw blog posts under data/BlogData/RawData")
+    parser.add_argument(
+        "--jobs", "-j", type=int, default=os.cpu_count() or 1,
+        help="number of worker processes used for image transcoding (default: CPU count)",
+    )
+    parser.add_argument(
+        "--item-workers", type=int, default=4,
+        help="number of raw items processed concurrently (default: 4)",
+    )
+    parser.add_argument(
+        "--no-cache", action="store_true",
+        help=f"do not read or populate the transcode cache in {TRANSCODE_CACHE_DIR.relative_to(ROOT).as_posix()}",
+    )
+    parser.add_argument(
+        "--cache-max-mb", type=int, default=TRANSCODE_CACHE_MAX_MB,
+        help=f"size budget of the transcode cache in MB (default: {TRANSCODE_CACHE_MAX_MB})",
+    )
+    parser.add_argument(
+        "--no-avif", action="store_true",
+        help="only write WebP variants, even when Pillow can encode AVIF",
+    )
+    parser.add_argument(
+        "--adaptive-webp", action="store_true",
+        help="pick WebP quality (or lossless) per image instead of the fixed quality; choices are "
+             f"recorded in {WEBP_SETTINGS_FILE.relative_to(ROOT).as_posix()}",
+    )
+    parser.add_argument(
+        "--max-pixels", type=int, default=MAX_PIXELS,
+        help=f"scale larger sources down to this many pixels (default: {MAX_PIXELS})",
+    )
+    parser.add_argument(
+        "--decode-budget-mb", type=int, default=DECODE_BUDGET_MB,
+        help=f"decoded image memory shared by all workers, in MB (default: {DECODE_BUDGET_MB})",
+    )
+    parser.add_argument(
+        "--report", type=Path, default=RUN_REPORT_FILE,
+        help=f"where to write the JSON timing report (default: {RUN_REPORT_FILE.relative_to(ROOT).as_posix()})",
+    )
+    parser.add_argument(
+        "--profile", action="store_true",
+        help="profile each raw item with cProfile/tracemalloc (runs items one at a time, transcoding inline)",
+    )
+    parser.add_argument(
+        "--full", action="store_true",
+        help="rebuild social meta, related posts and the search index of every published post, ignoring saved state",
+    )
+    parser.add_argument(
+        "--asset-store", action="store_true",
+        help="keep post media and social cards once, in data/BlogData/assets/<hash>, and link them from the HTML",
+    )
+    parser.add_argument(
+        "--no-minify", action="store_true",
+        help="write post HTML with its whitespace as authored",
+    )
+    parser.add_argument(
+        "--minify-existing", action="store_true",
+        help="also minify the HTML of posts published before (new posts are minified unless --no-minify)",
+    )
+    parser.add_argument(
+        "--precompress", action="store_true",
+        help="write .gz (and .br with the brotli module) siblings of the site's HTML, JSON, XML and CSS",
+    )
+    parser.add_argument(
+        "--watch", action="store_true",
+        help="serve the site locally and rebuild previews of RawData items as they change (nothing is archived)",
+    )
+    parser.add_argument(
+        "--port", type=int, default=8000,
+        help="port of the --watch server (default: 8000)",
+    )
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    global TRANSCODE_CACHE, SOCIAL_CARDS, ASSET_STORE, DECODE_BUDGET, MAX_PIXELS, MINIFY_HTML
+    args = parse_args(argv)
+    MINIFY_HTML = not args.no_minify
+    MAX_PIXELS = max(1, args.max_pixels)
+    DECODE_BUDGET = DecodeBudget(args.decode_budget_mb * 1024 * 1024)
+    if not args.no_cache:
+        TRANSCODE_CACHE = TranscodeCache(TRANSCODE_CACHE_DIR, args.cache_max_mb * 1024 * 1024)
+    SOCIAL_CARDS = SocialCards(TRANSCODE_CACHE)
+    if args.asset_store:
+        ASSET_STORE = AssetStore()
+    if args.watch:
+        return watch(args)
 
-def main():
     if not RAW_DIR.exists():
         print("Raw data dir does not exist, nothing to do.")
         return
 
-    meta = load_meta()
+    with STATS.timer("load_meta"):
+        meta = load_meta()
 
     # find candidates: files and directories directly under RAW_DIR, excluding archive
     candidates = [p for p in RAW_DIR.iterdir() if p.name != 'processed']
 
-    changed = False
+    new_ids = []
+    placer = MediaPlacer()
+    adaptive = adaptive_webp.SettingsRecord(WEBP_SETTINGS_FILE) if args.adaptive_webp else None
     if not candidates:
         print("No raw items to process.")
     else:
-        for item in sorted(candidates):
-            ok = process_item(item, meta)
-            if ok:
-                changed = True
-
-    if changed:
-        save_meta(meta)
+        with STATS.timer("plan"):
+            plans = plan_items(candidates, meta)
+        print(f"Planned {len(plans)} item(s): " + ", ".join(p.src_item.name for p in plans))
+        # profiling only sees this process, so transcode inline while it is on
+        jobs = 1 if args.profile else args.jobs
+        profiler = ItemProfiler(STATS) if args.profile else None
+        with STATS.timer("execute"), TranscodePool(
+            jobs, TRANSCODE_CACHE, avif=not args.no_avif, adaptive=adaptive,
+        ) as pool:
+            new_ids = execute_plans(plans, meta, pool, placer, workers=args.item_workers, profiler=profiler)
+        print(placer.summary())
+        if adaptive is not None and adaptive.save():
+            print(f"WebP settings recorded in {WEBP_SETTINGS_FILE.relative_to(ROOT).as_posix()}")
+
+    # posts.json and the sitemap are written once, after every item finished;
+    # a journal left behind by an interrupted run is compacted as well
+    if new_ids or post_store().journal_file.exists():
+        with STATS.timer("save_meta"):
+            save_meta(meta)
         print("Meta updated.")
-        update_sitemap(meta)
+        with STATS.timer("sitemap"):
+            update_sitemap(meta)
     else:
         print("No changes made.")
 
-    normalize_existing_posts_social_meta(meta)
+    with STATS.timer("related_posts"):
+        rewritten = RelatedIndex(BLOG_DIR, CATEGORY_FILE).update(meta, new_ids, full=args.full)
+    if rewritten:
+        print(f"Related posts updated for {rewritten} post(s)")
+
+    with STATS.timer("list_pages"):
+        listed = ListPages(BLOG_DIR, CATEGORY_FILE, INDEX_FILE).update(meta, full=args.full)
+    if listed:
+        print(f"Post list pages updated: {listed} file(s)")
+
+    with STATS.timer("social_meta"):
+        normalize_existing_posts_social_meta(meta, full=args.full, minify=args.minify_existing)
+    print(SOCIAL_CARDS.summary())
+
+    with STATS.timer("search_index"):
+        shards = SearchIndex(BLOG_DIR, ROOT).update(meta, full=args.full)
+    if shards:
+        print(f"Search index updated: {shards} file(s)")
+    if ASSET_STORE is not None:
+        print(f"Asset store: {ASSET_STORE.stored} stored, {ASSET_STORE.reused} already present")
+        STATS.set("assets_stored", ASSET_STORE.stored)
+        STATS.set("assets_reused", ASSET_STORE.reused)
+
+    if args.precompress:
+        with STATS.timer("precompress"):
+            files = site_text_files(ROOT, BLOG_DIR, skip_dirs=SKIP_DIRS)
+            written, unchanged = Precompressor(ROOT, PRECOMPRESS_MANIFEST_FILE, workers=args.jobs).run(files)
+        print(f"Precompressed: {written} sibling(s) written, {unchanged} file(s) unchanged")
+        STATS.set("precompressed_written", written)
+        STATS.set("precompressed_unchanged", unchanged)
+
+    if TRANSCODE_CACHE is not None:
+        with STATS.timer("cache_prune"):
+            evicted = TRANSCODE_CACHE.prune()
+        print(f"Transcode cache: {TRANSCODE_CACHE.hits} hit(s), {TRANSCODE_CACHE.misses} miss(es), {evicted} evicted")
+        STATS.set("cache_hits", TRANSCODE_CACHE.hits)
+        STATS.set("cache_misses", TRANSCODE_CACHE.misses)
+        STATS.set("cache_evicted", evicted)
+
+    STATS.set("social_cards_shared", SOCIAL_CARDS.shared)
+    STATS.set("social_cards_written", SOCIAL_CARDS.written)
+    STATS.set("files_linked", placer.linked)
+    STATS.set("files_copied", placer.copied)
+    STATS.set("videos_faststart", placer.faststart)
+    STATS.set("bytes_placed", placer.linked_bytes + placer.copied_bytes)
+    if resource is not None:
+        # ru_maxrss is KiB on Linux
+        STATS.set("max_rss_kib", resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+    try:
+        STATS.write(args.report)
+        print(f"Run report written to {args.report}")
+    except OSError as e:
+        print(f"Warning: failed to write run report {args.report}: {e}")
+    print(STATS.summary())
 
 
 if __name__ == '__main__':
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Build-time related posts.
+
+- tag-index.json     inverted index: tag id (from data/Category.json) -> published
+                     post ids, plus the state used for incremental updates
+- related/<id>.json  top RELATED_COUNT related posts for one post, with the
+                     fields the article page needs to render them
+
+Scoring matches what script.js used to do on every page view: 10 points per
+shared tag plus up to 5 points for date proximity (measured against the
+post's own date), ties broken by newest first. Posts without tags list the
+most recent posts.
+
+When posts are only appended, update() recomputes just the new posts and
+the ones whose lists they can enter: posts sharing a tag with them, untagged
+posts, and posts whose list was topped up with non-matching posts.
+"""
+import json
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+from post_store import dump_json, write_if_changed
+
+RELATED_COUNT = 5
+TAG_INDEX_NAME = "tag-index.json"
+RELATED_DIR_NAME = "related"
+
+
+def _timestamp(post):
+    try:
+        return datetime.fromisoformat(str(post.get("date")).replace("Z", "+00:00")).timestamp()
+    except ValueError:
+        return None
+
+
+def _digest(post):
+    # anything shown in or used to rank a related list; a change forces a full rebuild
+    fields = [post.get(k) for k in ("title", "summary", "date", "path", "tags")]
+    return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+
+def _published(meta: dict):
+    return [p for p in meta.get("posts", []) if p.get("published", True) is True and p.get("id") is not None]
+
+
+def load_category_names(category_file: Path):
+    """{tag id: name} from data/Category.json; empty when it cannot be read."""
+    try:
+        with Path(category_file).open("r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {c.get("id"): c.get("name") for c in data.get("category", []) if isinstance(c.get("id"), int)}
+
+
+def load_categories(category_file: Path):
+    return list(load_category_names(category_file))
+
+
+class RelatedIndex:
+    def __init__(self, blog_dir: Path, category_file: Path, count: int = RELATED_COUNT):
+        self.blog_dir = Path(blog_dir)
+        self.category_file = Path(category_file)
+        self.count = count
+        self.tag_index_file = self.blog_dir / TAG_INDEX_NAME
+        self.related_dir = self.blog_dir / RELATED_DIR_NAME
+
+    def related_file(self, post_id) -> Path:
+        return self.related_dir / f"{post_id}.json"
+
+    def _load_tag_index(self):
+        try:
+            with self.tag_index_file.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def build_tag_index(self, posts, base=None):
+        tags = {str(t): [] for t in load_categories(self.category_file)}
+        for tag, ids in (base or {}).items():
+            tags.setdefault(tag, []).extend(ids)
+        for post in sorted(posts, key=lambda p: p["id"]):
+            for tag in post.get("tags") or []:
+                ids = tags.setdefault(str(tag), [])
+                if post["id"] not in ids:
+                    ids.append(post["id"])
+        return tags
+
+    def _score(self, post, other, shared):
+        score = shared * 10
+        a, b = _timestamp(post), _timestamp(other)
+        if a is not None and b is not None:
+            days = abs(a - b) / 86400
+            score += max(0, 5 - days / 30)
+        return score
+
+    def compute(self, post, by_id, tag_index):
+        """Return (related posts, filled) where filled means non-matching posts were used."""
+        pid = post["id"]
+
+        def _key(item):
+            score, other = item
+            return (-score, -(_timestamp(other) or 0), -other["id"])
+
+        tags = post.get("tags") or []
+        if not tags:
+            others = [(0, p) for p in by_id.values() if p["id"] != pid]
+            return [p for _score, p in sorted(others, key=_key)[: self.count]], True
+
+        shared = {}
+        for tag in tags:
+            for other_id in tag_index.get(str(tag), []):
+                if other_id != pid and other_id in by_id:
+                    shared[other_id] = shared.get(other_id, 0) + 1
+        ranked = sorted(((self._score(post, by_id[i], n), by_id[i]) for i, n in shared.items()), key=_key)
+        filled = len(ranked) < self.count
+        if filled:
+            rest = [(self._score(post, p, 0), p) for p in by_id.values() if p["id"] != pid and p["id"] not in shared]
+            ranked += sorted(rest, key=_key)[: self.count - len(ranked)]
+        return [p for _score, p in ranked[: self.count]], filled
+
+    def _write(self, post, related, filled):
+        payload = {
+            "id": post["id"],
+            "filled": filled,
+            "related": [
+                {k: p.get(k) for k in ("id", "title", "summary", "date", "path")}
+                for p in related
+            ],
+        }
+        return write_if_changed(self.related_file(post["id"]), dump_json(payload))
+
+    def update(self, meta: dict, new_ids=(), full: bool = False):
+        """
+        Refresh tag-index.json and related/<id>.json. Falls back to a full rebuild
+        when the stored index does not match the published posts minus new_ids
+        (a post was edited, removed or unpublished). Returns the number of
+        related files rewritten.
+        """
+        posts = _published(meta)
+        by_id = {p["id"]: p for p in posts}
+        digests = {str(p["id"]): _digest(p) for p in sorted(posts, key=lambda p: p["id"])}
+        new_ids = {i for i in new_ids if i in by_id}
+        stored = None if full else self._load_tag_index()
+        incremental = stored is not None and stored.get("posts") == {
+            k: v for k, v in digests.items() if int(k) not in new_ids
+        }
+
+        if incremental:
+            tag_index = self.build_tag_index([by_id[i] for i in new_ids], stored.get("tags"))
+        else:
+            tag_index = self.build_tag_index(posts)
+        if incremental:
+            affected = set(new_ids)
+            previously_filled = set(stored.get("filled", []))
+            new_tags = {str(t) for i in new_ids for t in by_id[i].get("tags") or []}
+            for post in posts:
+                if post["id"] in affected:
+                    continue
+                tags = {str(t) for t in post.get("tags") or []}
+                if not tags or tags & new_tags or post["id"] in previously_filled:
+                    affected.add(post["id"])
+        else:
+            affected = set(by_id)
+
+        filled_ids = set(stored.get("filled", [])) - affected if incremental else set()
+        rewritten = 0
+        for pid in sorted(affected):
+            related, filled = self.compute(by_id[pid], by_id, tag_index)
+            if filled:
+                filled_ids.add(pid)
+            if self._write(by_id[pid], related, filled):
+                rewritten += 1
+
+        if not incremental and self.related_dir.exists():
+            for stale in self.related_dir.glob("*.json"):
+                if not stale.stem.isdigit() or int(stale.stem) not in by_id:
+                    stale.unlink()
+
+        write_if_changed(self.tag_index_file, dump_json({
+            "tags": tag_index,
+            "posts": digests,
+            "filled": sorted(filled_ids),
+        }))
+        return rewritten
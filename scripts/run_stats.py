@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Timers and counters for a process_raw_posts.py run.
+
+RunStats collects per-stage wall time and counters (images encoded, bytes
+in/out, cache hits, stat calls, ...) from any thread; report() is the JSON
+written at the end of a run and summary() the lines printed after it.
+
+ItemProfiler wraps one raw item in cProfile and tracemalloc. Both only see
+the calling thread and process, so --profile runs items one at a time with
+inline transcoding.
+"""
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from pathlib import Path
+from contextlib import contextmanager
+
+from post_store import dump_json, write_if_changed
+
+PROFILE_TOP = 15
+
+
+class RunStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self.timers = {}  # name -> [seconds, calls]
+        self.counters = {}
+        self.items = []
+        self.images = []
+
+    @contextmanager
+    def timer(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_time(name, time.perf_counter() - start)
+
+    def add_time(self, name: str, seconds: float, calls: int = 1):
+        with self._lock:
+            entry = self.timers.setdefault(name, [0.0, 0])
+            entry[0] += seconds
+            entry[1] += calls
+
+    def count(self, name: str, n: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def set(self, name: str, value):
+        with self._lock:
+            self.counters[name] = value
+
+    def add_item(self, item: dict):
+        with self._lock:
+            self.items.append(item)
+
+    def add_image(self, image: dict):
+        with self._lock:
+            self.images.append(image)
+
+    def report(self) -> dict:
+        with self._lock:
+            return {
+                "totalSeconds": round(time.perf_counter() - self._started, 4),
+                "timers": {
+                    name: {"seconds": round(seconds, 4), "calls": calls}
+                    for name, (seconds, calls) in sorted(self.timers.items())
+                },
+                "counters": dict(sorted(self.counters.items())),
+                "items": list(self.items),
+                "images": list(self.images),
+            }
+
+    def summary(self) -> str:
+        report = self.report()
+        # items and transcode workers overlap, so stage timers can add up past the wall time
+        lines = [f"Run finished in {report['totalSeconds']:.2f}s (stage times are summed over concurrent items)"]
+        timers = sorted(report["timers"].items(), key=lambda kv: kv[1]["seconds"], reverse=True)
+        for name, t in timers:
+            lines.append(f"  {name:<22} {t['seconds']:9.3f}s  x{t['calls']}")
+        if report["counters"]:
+            lines.append("  " + ", ".join(f"{k}={v}" for k, v in report["counters"].items()))
+        peaks = [i for i in report["images"] if i.get("peakRssKiB")]
+        for image in sorted(peaks, key=lambda i: i["peakRssKiB"], reverse=True)[:3]:
+            lines.append(f"  peak RSS {image['peakRssKiB'] / 1024:7.1f} MiB  {Path(image['src']).name}")
+        for item in report["items"]:
+            lines.append(
+                f"  item {item['label']}: {item['seconds']:.3f}s, "
+                f"peak {item['peakBytes'] / (1024 * 1024):.1f} MiB traced"
+            )
+            for spot in item["hotspots"][:5]:
+                lines.append(f"    {spot['own']:8.3f}s  {spot['function']}")
+        return "\n".join(lines)
+
+    def write(self, path: Path):
+        return write_if_changed(Path(path), dump_json(self.report(), indent=2))
+
+
+class ItemProfiler:
+    def __init__(self, stats: RunStats, top: int = PROFILE_TOP):
+        self.stats = stats
+        self.top = top
+
+    @contextmanager
+    def profile(self, label: str):
+        started_tracing = not tracemalloc.is_tracing()
+        if started_tracing:
+            tracemalloc.start()
+        tracemalloc.reset_peak()
+        profiler = cProfile.Profile()
+        start = time.perf_counter()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            seconds = time.perf_counter() - start
+            _current, peak = tracemalloc.get_traced_memory()
+            if started_tracing:
+                tracemalloc.stop()
+            self.stats.add_item({
+                "label": label,
+                "seconds": round(seconds, 4),
+                "peakBytes": peak,
+                "hotspots": self._hotspots(profiler),
+            })
+
+    def _hotspots(self, profiler):
+        entries = []
+        for (filename, line, func), (_cc, calls, tottime, cumtime, _callers) in pstats.Stats(profiler).stats.items():
+            entries.append({
+                "function": f"{func} ({Path(filename).name}:{line})",
+                "calls": calls,
+                "own": round(tottime, 4),
+                "cumulative": round(cumtime, 4),
+            })
+        # own time points at the code doing the work rather than the callers around it
+        entries.sort(key=lambda e: e["own"], reverse=True)
+        return entries[: self.top]
@@ -0,0 +1,299 @@
+#!/usr/bin/env python3
+"""
+Build-time full-text search index over published posts.
+
+- search/<nn>.json    one shard of the inverted index: term -> postings
+- search/delta.json   postings of the posts added or changed since the
+                      shards were last compacted, in the same format
+- search/index.json   shard count and tokenizer version for the client, the
+                      stale post ids, plus the state used for incremental
+                      updates
+
+Text is NFKC-normalized and lowercased. Runs of kana, kanji and hangul become
+character bigrams, plus the last character of the run on its own, so every
+character starts at least one term. Other letters and digits form whole
+words. Titles, summaries and body text (the post's .card-content blocks)
+are weighted FIELD_WEIGHTS.
+
+A term lives in shard ord(term[0]) % SHARD_COUNT, written as two hex digits
+(e.g. search/1f.json), so a query fetches one shard per distinct first
+character, plus delta.json. All terms starting with a character share its
+shard, so a one-character query is answered by the prefix matches in one
+file. A client drops the postings of the ids listed as stale in index.json
+from what the shards return (those posts changed or are gone) and adds the
+postings delta.json has for the term.
+
+Postings are [id, weight] pairs sorted by id, flattened and delta-encoded:
+[id0, w0, id1 - id0, w1, ...].
+
+update() re-tokenizes only posts whose HTML bytes or title/summary changed.
+A post's terms span most shards, so a run does not touch the shards at all:
+it rewrites delta.json, which holds at most MAX_PENDING_POSTS posts, and
+index.json. Once more posts than that are pending (counting changed and
+removed ones), the delta is compacted: every shard holding a term of a
+pending post or a posting of a stale one is rewritten, and delta.json is
+removed. --full rebuilds every shard. Nothing stat-based is stored, so a
+fresh checkout changes nothing.
+"""
+import re
+import json
+import hashlib
+import unicodedata
+from pathlib import Path
+from html.parser import HTMLParser
+
+from post_store import dump_json, write_if_changed
+
+SEARCH_DIR_NAME = "search"
+INDEX_NAME = "index.json"
+DELTA_NAME = "delta.json"
+SHARD_COUNT = 64
+# posts kept in delta.json before it is compacted into the shards
+MAX_PENDING_POSTS = 16
+# bump when tokenization or the file format changes; the index is rebuilt
+TOKENIZER_VERSION = 2
+MAX_TERM_CHARS = 32
+FIELD_WEIGHTS = {"title": 3, "summary": 2, "body": 1}
+
+CJK_CHARS = "ぁ-ヿ㐀-䶿一-鿿豈-﫿가-힯々〆"
+TOKEN_RE = re.compile(rf"(?P<cjk>[{CJK_CHARS}]+)|(?P<word>(?:(?![{CJK_CHARS}])[^\W_])+)")
+CONTENT_CLASS = "card-content"
+SKIP_TAGS = {"script", "style", "aside", "nav", "button", "noscript", "template"}
+VOID_TAGS = {"area", "base", "br", "col", "embed", "hr", "img", "input", "link", "meta", "source", "track", "wbr"}
+
+
+def tokenize(text: str):
+    """Yields the index terms of text, repeats included."""
+    text = unicodedata.normalize("NFKC", text or "").lower()
+    for m in TOKEN_RE.finditer(text):
+        run = m.group("cjk")
+        if run is None:
+            yield m.group("word")[:MAX_TERM_CHARS]
+            continue
+        for i in range(len(run) - 1):
+            yield run[i:i + 2]
+        yield run[-1]
+
+
+def shard_of(term: str) -> str:
+    return f"{ord(term[0]) % SHARD_COUNT:02x}"
+
+
+class _BodyText(HTMLParser):
+    """Text of the .card-content blocks, or of <body> (minus menus and scripts) when there are none."""
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.stack = []
+        self.skip = 0
+        self.content_depth = None
+        self.content = []
+        self.fallback = []
+
+    def handle_starttag(self, tag, attrs):
+        if tag in VOID_TAGS:
+            return
+        self.stack.append(tag)
+        if tag in SKIP_TAGS:
+            self.skip += 1
+        classes = (dict(attrs).get("class") or "").split()
+        if self.content_depth is None and CONTENT_CLASS in classes:
+            self.content_depth = len(self.stack)
+
+    def handle_endtag(self, tag):
+        if tag not in self.stack:
+            return
+        while self.stack:
+            open_tag = self.stack.pop()
+            if open_tag in SKIP_TAGS:
+                self.skip -= 1
+            if self.content_depth is not None and len(self.stack) < self.content_depth:
+                self.content_depth = None
+            if open_tag == tag:
+                break
+
+    def handle_data(self, data):
+        if self.skip:
+            return
+        if self.content_depth is not None:
+            self.content.append(data)
+        elif "body" in self.stack:
+            self.fallback.append(data)
+
+    def text(self) -> str:
+        return " ".join(self.content or self.fallback)
+
+
+def body_text(html: str) -> str:
+    parser = _BodyText()
+    parser.feed(html)
+    parser.close()
+    return parser.text()
+
+
+def doc_terms(post: dict, body: str) -> dict:
+    """{term: weight} of one post."""
+    terms = {}
+    for field, text in (("title", post.get("title")), ("summary", post.get("summary")), ("body", body)):
+        weight = FIELD_WEIGHTS[field]
+        for term in tokenize(text or ""):
+            terms[term] = terms.get(term, 0) + weight
+    return terms
+
+
+def encode_postings(pairs) -> list:
+    flat = []
+    previous = 0
+    for doc_id, weight in sorted(pairs):
+        flat += [doc_id - previous, weight]
+        previous = doc_id
+    return flat
+
+
+def decode_postings(flat) -> list:
+    pairs = []
+    doc_id = 0
+    for i in range(0, len(flat) - 1, 2):
+        doc_id += flat[i]
+        pairs.append((doc_id, flat[i + 1]))
+    return pairs
+
+
+class SearchIndex:
+    def __init__(self, blog_dir: Path, root: Path):
+        self.blog_dir = Path(blog_dir)
+        self.root = Path(root)
+        self.search_dir = self.blog_dir / SEARCH_DIR_NAME
+        self.index_file = self.search_dir / INDEX_NAME
+        self.delta_file = self.search_dir / DELTA_NAME
+
+    def shard_file(self, key: str) -> Path:
+        return self.search_dir / f"{key}.json"
+
+    def _load_json(self, path: Path):
+        try:
+            with path.open("r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _signature(self, post: dict, html: bytes):
+        # content only: a checkout changes every mtime, and the index is committed
+        fields = [post.get("title"), post.get("summary"), post.get("path"), hashlib.sha256(html).hexdigest()]
+        return hashlib.sha1(json.dumps(fields, ensure_ascii=False).encode("utf-8")).hexdigest()[:12]
+
+    def _write_postings(self, path: Path, postings: dict) -> bool:
+        if not postings:
+            if path.exists():
+                path.unlink()
+            return False
+        encoded = {term: encode_postings(pairs) for term, pairs in sorted(postings.items())}
+        return write_if_changed(path, dump_json(encoded))
+
+    def update(self, meta: dict, full: bool = False) -> int:
+        """
+        Bring search/ up to date with the published posts in meta. Falls back
+        to a full rebuild when the stored index is missing or was built with
+        other tokenizer settings. Returns the number of shard and delta files
+        written.
+        """
+        stored = None if full else self._load_json(self.index_file)
+        if not stored or stored.get("version") != TOKENIZER_VERSION or stored.get("shards") != SHARD_COUNT:
+            stored = None
+        rebuild = stored is None
+        old_docs = {} if rebuild else stored.get("docs", {})
+        # {id: shards} of posts whose postings in the shards are out of date
+        stale = {} if rebuild else dict(stored.get("stale", {}))
+
+        docs = {}
+        changed = {}
+        for post in meta.get("posts", []):
+            if post.get("published", True) is not True or post.get("id") is None or not post.get("path"):
+                continue
+            sid = str(post["id"])
+            html_path = self.root / post["path"]
+            try:
+                html = html_path.read_bytes()
+            except OSError:
+                continue
+            sig = self._signature(post, html)
+            old = old_docs.get(sid)
+            if old and old.get("sig") == sig:
+                docs[sid] = old
+                continue
+            try:
+                terms = doc_terms(post, body_text(html.decode("utf-8")))
+            except UnicodeDecodeError as e:
+                print(f"Warning: cannot index {html_path}: {e}")
+                continue
+            digest = hashlib.sha1(dump_json(sorted(terms.items()))).hexdigest()[:12]
+            if old and old.get("digest") == digest:
+                docs[sid] = dict(old, sig=sig)
+                continue
+            changed[post["id"]] = terms
+            # "shards" is set once the post's postings are compacted into them
+            docs[sid] = {"sig": sig, "digest": digest}
+        for sid, old in old_docs.items():
+            if "shards" in old and (sid not in docs or int(sid) in changed):
+                stale[sid] = old["shards"]
+
+        delta = {}
+        if not rebuild:
+            for term, flat in (self._load_json(self.delta_file) or {}).items():
+                kept = [(i, w) for i, w in decode_postings(flat) if str(i) in docs and i not in changed]
+                if kept:
+                    delta[term] = kept
+        for doc_id, terms in changed.items():
+            for term, weight in terms.items():
+                delta.setdefault(term, []).append((doc_id, weight))
+        pending = {i for pairs in delta.values() for i, _w in pairs}
+        if not rebuild and any("shards" not in d and int(sid) not in pending for sid, d in docs.items()):
+            # a pending post's postings are missing from delta.json
+            return self.update(meta, full=True)
+
+        written = 0
+        if rebuild or len(pending) + len(stale) > MAX_PENDING_POSTS:
+            written += self._compact(docs, delta, stale, rebuild)
+            delta, stale = {}, {}
+        if self._write_postings(self.delta_file, delta):
+            written += 1
+
+        write_if_changed(self.index_file, dump_json({
+            "version": TOKENIZER_VERSION,
+            "shards": SHARD_COUNT,
+            "stale": dict(sorted(stale.items(), key=lambda kv: int(kv[0]))),
+            "docs": dict(sorted(docs.items(), key=lambda kv: int(kv[0]))),
+        }))
+        return written
+
+    def _compact(self, docs: dict, delta: dict, stale: dict, rebuild: bool) -> int:
+        """Fold delta into the shards, dropping stale postings; fills in docs' "shards"."""
+        drop = {int(sid) for sid in stale} | {i for pairs in delta.values() for i, _w in pairs}
+        if rebuild:
+            affected = {p.stem for p in self.search_dir.glob("*.json") if p.name not in (INDEX_NAME, DELTA_NAME)}
+        else:
+            affected = {key for shards in stale.values() for key in shards}
+        doc_shards = {}
+        for term, pairs in delta.items():
+            key = shard_of(term)
+            affected.add(key)
+            for doc_id, _weight in pairs:
+                doc_shards.setdefault(doc_id, set()).add(key)
+
+        written = 0
+        for key in sorted(affected):
+            shard_file = self.shard_file(key)
+            postings = {}
+            if not rebuild:
+                for term, flat in (self._load_json(shard_file) or {}).items():
+                    kept = [(i, w) for i, w in decode_postings(flat) if i not in drop]
+                    if kept:
+                        postings[term] = kept
+            for term, pairs in delta.items():
+                if shard_of(term) == key:
+                    postings.setdefault(term, []).extend(pairs)
+            if self._write_postings(shard_file, postings):
+                written += 1
+        for doc_id, keys in doc_shards.items():
+            docs[str(doc_id)]["shards"] = sorted(keys)
+        return written
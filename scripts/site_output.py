@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+"""
+Post-processing of the text files the site serves.
+
+minify_html() collapses each whitespace run in the text between tags to one
+newline (when the run had one) or one space, which renders the same. Tags,
+attribute values, comments and <pre>, <textarea>, <script> and <style>
+elements are left as they are. Only ASCII whitespace counts, so &nbsp; and
+full-width spaces in the text survive.
+
+Precompressor writes gzip siblings (x.html -> x.html.gz), plus brotli ones
+(x.html.br) when the brotli module is installed, for hosts and CDNs that
+serve precompressed files as they are. Files are compressed on a thread
+pool (zlib and brotli release the GIL), a file whose content hash matches
+the manifest and whose siblings exist is skipped, and siblings whose source
+is gone are removed. To precompress the site as it is:
+
+    python scripts/site_output.py [--jobs N]
+"""
+import os
+import re
+import sys
+import gzip
+import hashlib
+import json
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from post_store import dump_json, write_if_changed
+
+try:
+    import brotli
+except ImportError:  # optional; only .gz siblings without it
+    brotli = None
+
+ROOT = Path(__file__).resolve().parent.parent
+BLOG_DIR = ROOT / "data" / "BlogData"
+PRECOMPRESS_MANIFEST_FILE = ROOT / ".cache" / "precompress.json"
+# raw inputs and local build state are not served
+SKIP_DIRS = (BLOG_DIR / "RawData",)
+
+GZIP_LEVEL = 9
+BROTLI_QUALITY = 11
+PRECOMPRESS_EXTS = (".html", ".json", ".xml", ".css")
+# below this, the compressed file plus its headers saves nothing
+MIN_PRECOMPRESS_BYTES = 512
+SIBLING_EXTS = (".gz", ".br")
+
+PROTECTED_RE = re.compile(r"<(pre|textarea|script|style)\b.*?</\1\s*>", flags=re.I | re.S)
+TAG_RE = re.compile(r"(<[^>]*>)")
+ASCII_WS_RE = re.compile(r"[ \t\n\r\f]+")
+
+
+def _collapse(match):
+    return "\n" if "\n" in match.group(0) or "\r" in match.group(0) else " "
+
+
+def _minify_markup(html: str) -> str:
+    parts = TAG_RE.split(html)
+    # split with one group: even indexes are text, odd ones are tags
+    for i in range(0, len(parts), 2):
+        parts[i] = ASCII_WS_RE.sub(_collapse, parts[i])
+    return "".join(parts)
+
+
+def minify_html(html: str) -> str:
+    out = []
+    pos = 0
+    for m in PROTECTED_RE.finditer(html):
+        out.append(_minify_markup(html[pos:m.start()]))
+        out.append(m.group(0))
+        pos = m.end()
+    out.append(_minify_markup(html[pos:]))
+    return "".join(out)
+
+
+def gzip_bytes(data: bytes) -> bytes:
+    # mtime=0 keeps the output byte-identical between runs
+    return gzip.compress(data, compresslevel=GZIP_LEVEL, mtime=0)
+
+
+def site_text_files(root: Path, blog_dir: Path, skip_dirs=()):
+    """The HTML, JSON, XML and CSS files the site serves."""
+    root = Path(root)
+    files = [p for p in root.iterdir() if p.is_file() and p.suffix.lower() in PRECOMPRESS_EXTS]
+    skip = {str(Path(d)) for d in skip_dirs}
+    for dirpath, dirnames, filenames in os.walk(blog_dir):
+        dirnames[:] = [d for d in dirnames if os.path.join(dirpath, d) not in skip]
+        for name in filenames:
+            path = Path(dirpath) / name
+            if path.suffix.lower() in PRECOMPRESS_EXTS and not name.startswith("."):
+                files.append(path)
+    return sorted(files)
+
+
+class Precompressor:
+    def __init__(self, root: Path, manifest_file: Path, workers: int = None):
+        self.root = Path(root)
+        self.manifest_file = Path(manifest_file)
+        self.workers = workers or os.cpu_count() or 1
+        self.formats = [(".gz", gzip_bytes)]
+        if brotli is not None:
+            self.formats.append((".br", lambda data: brotli.compress(data, quality=BROTLI_QUALITY)))
+
+    def _load_manifest(self):
+        try:
+            with self.manifest_file.open("r", encoding="utf-8") as f:
+                return json.load(f).get("files", {})
+        except (OSError, ValueError):
+            return {}
+
+    def _compress(self, path: Path, previous: str):
+        """Returns (sha256 or None when too small, siblings written)."""
+        data = path.read_bytes()
+        if len(data) < MIN_PRECOMPRESS_BYTES:
+            return None, 0
+        digest = hashlib.sha256(data).hexdigest()
+        siblings = [(path.with_name(path.name + ext), fn) for ext, fn in self.formats]
+        if digest == previous and all(s.exists() for s, _fn in siblings):
+            return digest, 0
+        written = 0
+        for sibling, fn in siblings:
+            if write_if_changed(sibling, fn(data)):
+                written += 1
+        return digest, written
+
+    def run(self, files):
+        """Compress files (skipping unchanged ones) and drop orphaned siblings. Returns (written, skipped)."""
+        previous = self._load_manifest()
+        files = list(files)
+        rels = [p.relative_to(self.root).as_posix() for p in files]
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            results = list(executor.map(lambda pr: self._compress(pr[0], previous.get(pr[1])), zip(files, rels)))
+
+        manifest = {}
+        written = skipped = 0
+        for rel, (digest, count) in zip(rels, results):
+            if digest is None:
+                continue
+            manifest[rel] = digest
+            written += count
+            skipped += 0 if count else 1
+
+        wanted = {p.with_name(p.name + ext) for p, rel in zip(files, rels) if rel in manifest for ext, _fn in self.formats}
+        for path in files:
+            for ext in SIBLING_EXTS:
+                sibling = path.with_name(path.name + ext)
+                if sibling not in wanted and sibling.exists():
+                    sibling.unlink()
+        for rel in set(previous) - set(manifest):
+            for ext in SIBLING_EXTS:
+                sibling = self.root / (rel + ext)
+                if sibling.exists():
+                    sibling.unlink()
+
+        write_if_changed(self.manifest_file, dump_json({"files": dict(sorted(manifest.items()))}))
+        return written, skipped
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write .gz (and .br) siblings of the site's text files")
+    parser.add_argument("--jobs", "-j", type=int, default=os.cpu_count() or 1, help="compression threads")
+    args = parser.parse_args(argv)
+
+    files = site_text_files(ROOT, BLOG_DIR, skip_dirs=SKIP_DIRS)
+    written, skipped = Precompressor(ROOT, PRECOMPRESS_MANIFEST_FILE, workers=args.jobs).run(files)
+    kinds = ".gz/.br" if brotli is not None else ".gz"
+    print(f"Precompressed ({kinds}): {written} sibling(s) written, {skipped} file(s) unchanged")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
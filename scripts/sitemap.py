@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+Sitemap generation shared by process_raw_posts.py and update_sitemap.py.
+
+Up to MAX_URLS_PER_FILE URLs go into a single sitemap.xml. Beyond that the
+URLs are split into sitemap-pages.xml (main pages) and sitemap-posts-N.xml
+(posts in id order, so a new post only touches the last shard), listed by
+sitemap-index.xml, and robots.txt is pointed at the index.
+
+Files are rendered line by line into a temp file and only replace the
+existing file when the bytes differ. lastmod of the main pages is the
+newest post date, so re-running without new posts changes nothing.
+"""
+import os
+import hashlib
+from pathlib import Path
+from datetime import datetime
+
+from site_config import file_sha256
+
+MAX_URLS_PER_FILE = 50000
+SITEMAP_NAME = "sitemap.xml"
+INDEX_NAME = "sitemap-index.xml"
+PAGES_SHARD_NAME = "sitemap-pages.xml"
+POSTS_SHARD_PREFIX = "sitemap-posts-"
+XMLNS = "http://www.sitemaps.org/schemas/sitemap/0.9"
+
+
+def _lastmod(date_str):
+    try:
+        return datetime.fromisoformat(str(date_str).replace('Z', '+00:00')).strftime('%Y-%m-%d')
+    except ValueError:
+        return None
+
+
+def write_lines_if_changed(path: Path, lines) -> bool:
+    """Stream lines into a temp file; keep it only if it differs from path."""
+    tmp = path.with_name(f".{path.name}.tmp")
+    h = hashlib.sha256()
+    with tmp.open("w", encoding="utf-8", newline="\n") as f:
+        for line in lines:
+            data = line + "\n"
+            f.write(data)
+            h.update(data.encode("utf-8"))
+    try:
+        unchanged = h.hexdigest() == file_sha256(path)
+    except OSError:
+        unchanged = False
+    if unchanged:
+        tmp.unlink()
+        return False
+    os.replace(tmp, path)
+    return True
+
+
+def _url_lines(loc, lastmod, changefreq, priority):
+    yield '<url>'
+    yield f'<loc>{loc}</loc>'
+    if lastmod:
+        yield f'<lastmod>{lastmod}</lastmod>'
+    yield f'<changefreq>{changefreq}</changefreq>'
+    yield f'<priority>{priority}</priority>'
+    yield '</url>'
+
+
+def _urlset(entries):
+    yield '<?xml version="1.0" encoding="UTF-8"?>'
+    yield f'<urlset xmlns="{XMLNS}">'
+    for entry in entries:
+        yield from _url_lines(*entry)
+    yield '</urlset>'
+
+
+def _sitemapindex(shards):
+    yield '<?xml version="1.0" encoding="UTF-8"?>'
+    yield f'<sitemapindex xmlns="{XMLNS}">'
+    for loc, lastmod in shards:
+        yield '<sitemap>'
+        yield f'<loc>{loc}</loc>'
+        if lastmod:
+            yield f'<lastmod>{lastmod}</lastmod>'
+        yield '</sitemap>'
+    yield '</sitemapindex>'
+
+
+def _point_robots_at(robots_file: Path, sitemap_url: str):
+    if not robots_file.exists():
+        return False
+    lines = robots_file.read_text(encoding="utf-8").splitlines()
+    updated = [f"Sitemap: {sitemap_url}" if l.startswith("Sitemap:") else l for l in lines]
+    if updated == lines:
+        return False
+    robots_file.write_text("\n".join(updated) + "\n", encoding="utf-8")
+    return True
+
+
+def update_sitemap(meta: dict, root: Path, base_url: str, max_urls: int = MAX_URLS_PER_FILE) -> dict:
+    """
+    Write the sitemap for meta under root. Returns a summary with the number of
+    published posts, total URLs and the files that were rewritten.
+    """
+    root = Path(root)
+    posts = [p for p in meta.get('posts', []) if p.get('published', True) and p.get('path')]
+    post_lastmods = [_lastmod(p.get('date')) for p in posts]
+    site_lastmod = max((d for d in post_lastmods if d), default=None)
+
+    main_entries = [
+        (base_url, site_lastmod, "weekly", "1.0"),
+        (f"{base_url}index.html", site_lastmod, "weekly", "1.0"),
+    ]
+
+    written = []
+    total = len(main_entries) + len(posts)
+    sharded = total > max_urls
+    sitemap_file = root / SITEMAP_NAME
+    index_file = root / INDEX_NAME
+    shard_files = set(root.glob(f"{POSTS_SHARD_PREFIX}*.xml")) | {root / PAGES_SHARD_NAME}
+
+    if not sharded:
+        # newest first, as before
+        ordered = sorted(zip(posts, post_lastmods), key=lambda x: x[0].get('date', ''), reverse=True)
+        entries = main_entries + [
+            (f"{base_url}{p['path']}", lastmod or site_lastmod, "monthly", "0.8") for p, lastmod in ordered
+        ]
+        if write_lines_if_changed(sitemap_file, _urlset(entries)):
+            written.append(sitemap_file)
+        for stale in shard_files | {index_file}:
+            if stale.exists():
+                stale.unlink()
+        _point_robots_at(root / "robots.txt", f"{base_url}{SITEMAP_NAME}")
+    else:
+        shards = []
+        pages_file = root / PAGES_SHARD_NAME
+        if write_lines_if_changed(pages_file, _urlset(main_entries)):
+            written.append(pages_file)
+        shards.append((f"{base_url}{PAGES_SHARD_NAME}", site_lastmod))
+
+        ordered = sorted(zip(posts, post_lastmods), key=lambda x: x[0].get('id') or 0)
+        keep = {pages_file}
+        for n, start in enumerate(range(0, len(ordered), max_urls), start=1):
+            chunk = ordered[start:start + max_urls]
+            shard_file = root / f"{POSTS_SHARD_PREFIX}{n}.xml"
+            keep.add(shard_file)
+            entries = (
+                (f"{base_url}{p['path']}", lastmod or site_lastmod, "monthly", "0.8") for p, lastmod in chunk
+            )
+            if write_lines_if_changed(shard_file, _urlset(entries)):
+                written.append(shard_file)
+            shards.append((f"{base_url}{shard_file.name}", max((d for _p, d in chunk if d), default=site_lastmod)))
+
+        if write_lines_if_changed(index_file, _sitemapindex(shards)):
+            written.append(index_file)
+        for stale in (shard_files - keep) | {sitemap_file}:
+            if stale.exists():
+                stale.unlink()
+        _point_robots_at(root / "robots.txt", f"{base_url}{INDEX_NAME}")
+
+    return {"published": len(posts), "urls": total, "sharded": sharded, "written": written}